@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+import zpy.files
+
+FILENAMES = [
+    "image.00001.iseg.png",
+    "image.00001.cseg.jpg",
+    "image.00001.depth.png",
+    "image.00001.normal.png",
+    "image.00001.stereoL.png",
+    "image.00001.stereoR.bmp",
+    "image.00001.rgb.jpeg",
+    "rgb_image.00001.iseg.png",
+    "image.00001.png",
+    "iseg.png",
+    "foo.png.txt",
+    "rgb.json",
+    "_annotations.zumo.json",
+    "coco_annotations.json",
+    "annotations.xml",
+    "config.yaml",
+    "data.csv",
+    "notes.txt",
+    "rgb",
+    "",
+]
+
+
+def _slow_match_filetype(filename):
+    """Ordered search over every FILE_REGEX pattern, the reference behavior."""
+    for name, re_pattern in zpy.files.FILE_REGEX_COMPILED.items():
+        if re_pattern.search(filename):
+            return name
+    return None
+
+
+@pytest.mark.parametrize("filename", FILENAMES)
+def test_match_filetype_fast_path(filename):
+    assert zpy.files._match_filetype(
+        filename, zpy.files.FILE_REGEX_COMPILED
+    ) == _slow_match_filetype(filename)
+
+
+def test_dataset_contents(tmp_path):
+    for filename in FILENAMES[:-2]:
+        (tmp_path / filename).touch()
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "image.00002.rgb.png").touch()
+    for max_workers in [None, 1, 4]:
+        contents = zpy.files.dataset_contents(tmp_path, max_workers=max_workers)
+        assert sorted(contents["dirs"]) == sorted(
+            [str(tmp_path), str(tmp_path / "sub")]
+        )
+        assert sorted(contents["rgb image"]) == sorted(
+            [
+                str(tmp_path / "image.00001.rgb.jpeg"),
+                str(tmp_path / "sub" / "image.00002.rgb.png"),
+            ]
+        )
+        assert contents["zumo annotation"] == [str(tmp_path / "_annotations.zumo.json")]
+
+
+def test_json_round_trip_nan(tmp_path):
+    path = tmp_path / "data.json"
+    data = {"a": float("nan"), "b": [1, 2.5, float("inf")], "c": "foo"}
+    zpy.files.write_json(path, data)
+    # Non-finite floats are written as json tokens, with a 4 space indent
+    assert "NaN" in path.read_text()
+    assert '\n    "c": "foo"' in path.read_text()
+    loaded = zpy.files.read_json(path)
+    assert math.isnan(loaded["a"])
+    assert loaded["b"] == [1, 2.5, float("inf")]
+    assert loaded["c"] == "foo"
+
+
+def test_json_not_json_file(tmp_path):
+    with pytest.raises(ValueError):
+        zpy.files.write_json(tmp_path / "data.txt", {})
+    with pytest.raises(ValueError):
+        zpy.files.read_json(tmp_path / "data.txt")
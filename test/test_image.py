@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from skimage import io
+
+import zpy.image
+
+
+def _rle_to_binary_mask(rle):
+    """Decode an uncompressed (column-major) COCO RLE dictionary."""
+    flat_mask = np.zeros(np.prod(rle["size"]), dtype=bool)
+    position = 0
+    for i, count in enumerate(rle["counts"]):
+        if i % 2 == 1:
+            flat_mask[position : position + count] = True
+        position += count
+    return flat_mask.reshape(rle["size"], order="F")
+
+
+@pytest.fixture
+def seg_image_path(tmp_path):
+    img = np.zeros((64, 80, 3), dtype=np.uint8)
+    img[10:30, 20:50] = (255, 0, 0)
+    img[40:60, 5:20] = (0, 128, 255)
+    path = tmp_path / "image.00001.iseg.png"
+    io.imsave(path, img, check_contrast=False)
+    return path
+
+
+def test_binary_mask_to_rle():
+    mask = np.zeros((4, 5), dtype=bool)
+    mask[1:3, 2:4] = True
+    rle = zpy.image.binary_mask_to_rle(mask)
+    assert rle["size"] == [4, 5]
+    assert rle["counts"] == [9, 2, 2, 2, 5]
+    assert np.array_equal(_rle_to_binary_mask(rle), mask)
+    # Counts always start with the number of zeros
+    assert zpy.image.binary_mask_to_rle(np.ones((2, 2), dtype=bool))["counts"] == [
+        0,
+        4,
+    ]
+
+
+def test_seg_to_annotations(seg_image_path):
+    annotations = zpy.image.seg_to_annotations(
+        seg_image_path, rle_segmentations=True, float_annotations=True
+    )
+    # Colors come back as floats in (0, 1)
+    annotations = {
+        tuple(np.round(np.array(annotation["color"]) * 255).astype(int)): annotation
+        for annotation in annotations
+    }
+    assert set(annotations.keys()) == {(255, 0, 0), (0, 128, 255)}
+    for color, (rows, cols) in [
+        ((255, 0, 0), (slice(10, 30), slice(20, 50))),
+        ((0, 128, 255), (slice(40, 60), slice(5, 20))),
+    ]:
+        annotation = annotations[color]
+        # RLE covers the image with one pixel of padding on each side,
+        # and the salt removal (binary opening) cuts off the corner pixels
+        expected_mask = np.zeros((66, 82), dtype=bool)
+        expected_mask[
+            rows.start + 1 : rows.stop + 1, cols.start + 1 : cols.stop + 1
+        ] = True
+        for row in (rows.start + 1, rows.stop):
+            for col in (cols.start + 1, cols.stop):
+                expected_mask[row, col] = False
+        rle = annotation["segmentation_rle"]
+        assert rle["size"] == [66, 82]
+        assert np.array_equal(_rle_to_binary_mask(rle), expected_mask)
+        # Bounding box is within a pixel of the rectangle
+        x, y, width, height = annotation["bbox"]
+        assert x == pytest.approx(cols.start, abs=1)
+        assert y == pytest.approx(rows.start, abs=1)
+        assert width == pytest.approx(cols.stop - cols.start, abs=1)
+        assert height == pytest.approx(rows.stop - rows.start, abs=1)
+        assert annotation["area"] == pytest.approx(
+            (cols.stop - cols.start) * (rows.stop - rows.start), rel=0.1
+        )
+        assert annotation["bbox_float"] == pytest.approx(
+            [x / 80, y / 64, width / 80, height / 64]
+        )
+        assert len(annotation["segmentation"]) == len(annotation["segmentation_float"])
+
+
+def test_seg_to_annotations_background_only(tmp_path):
+    path = tmp_path / "image.00001.iseg.png"
+    io.imsave(path, np.zeros((16, 16, 3), dtype=np.uint8), check_contrast=False)
+    assert zpy.image.seg_to_annotations(path) == []
+
+
+def test_streaming_pixel_stats():
+    rng = np.random.default_rng(0)
+    images = [rng.random((8, 6, 3)), rng.random((5, 7, 3))]
+    stats = zpy.image.streaming_pixel_stats(images)
+    pixels = np.concatenate([image.reshape(-1, 3) for image in images])
+    assert stats["mean"] == pytest.approx(pixels.mean(axis=0))
+    assert stats["std"] == pytest.approx(pixels.std(axis=0))
+    with pytest.raises(ValueError):
+        zpy.image.streaming_pixel_stats([])
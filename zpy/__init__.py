@@ -10,10 +10,9 @@ log = py_logging.getLogger(__name__)
 # Import files first since it is used in other zpy modules
 from zpy import files
 
-# Color utilities will reset the random colors on import
+# Color utilities load the random colors lazily on first use
 from zpy import color
 
-color.reset()
 from zpy import gin
 from zpy import image
 from zpy import logging
@@ -25,7 +25,9 @@ def get_asset_lib_path() -> Path:
         log.warning("Could not find environment variable $ASSETS")
         return None
     else:
-        assets_env_path = zpy.files.verify_path(assets_env_path, check_dir=True)
+        assets_env_path = zpy.files.verify_path(
+            assets_env_path, check_dir=True, resolve=True
+        )
         log.info(f"Found assets path at {assets_env_path}")
         return assets_env_path
 
@@ -222,7 +222,7 @@ def load_text_from_file(
         path (Union[Path, str]): Filesystem path.
         text_name (str, optional): Name of Blender text to write to.
     """
-    path = zpy.files.verify_path(path)
+    path = zpy.files.verify_path(path, resolve=True)
     if bpy.data.texts.get(text_name, None) is None:
         _text = bpy.data.texts.load(str(path), internal=True)
         _text.name = text_name
@@ -246,7 +246,7 @@ def connect_addon(
     """
     log.debug(f"Connecting Addon {name}.")
     path = f"$BLENDERADDONS/{name}/__init__.py"
-    path = zpy.files.verify_path(path, make=False)
+    path = zpy.files.verify_path(path, make=False, resolve=True)
     bpy.ops.preferences.addon_install(filepath=str(path))
     bpy.ops.preferences.addon_enable(module=name)
 
@@ -281,7 +281,7 @@ def save_debug_blenderfile(
     """
     if path is None:
         path = zpy.files.default_temp_path() / "_debug.blend"
-    path = zpy.files.verify_path(path, make=False)
+    path = zpy.files.verify_path(path, make=False, resolve=True)
     log.debug(f"Saving intermediate blenderfile to {path}")
     bpy.ops.wm.save_as_mainfile(filepath=str(path), compress=False, copy=True)
 
@@ -309,7 +309,7 @@ def load_sim(
     """
     # HACK: Clear out scene of cameras and lights
     clear_scene(["CAMERA", "LIGHT"])
-    path = zpy.files.verify_path(path, make=False)
+    path = zpy.files.verify_path(path, make=False, resolve=True)
     log.debug(f"Loading sim from {str(path)}.")
     with bpy.data.libraries.load(str(path)) as (data_from, data_to):
         for attr in dir(data_to):
@@ -3,12 +3,13 @@
 """
 import logging
 import math
-from typing import Tuple, Union
+from typing import List, Tuple, Union
 
 import bpy
 import bpy_extras
 import gin
 import mathutils
+import numpy as np
 
 import zpy
 
@@ -261,8 +262,13 @@ def camera_xyv(
         height (int, optional): Height of image. Defaults to 480.
 
     Returns:
-        Tuple[int]: (X, Y, V)
+        Tuple[int]: (X, Y, V), or an (N, 3) array of them when given an (N, 3) array of locations.
     """
+    if isinstance(location, np.ndarray) and location.ndim == 2:
+        # Many points at once, with the same (gin bound) image size
+        return camera_xyv_batch(
+            location, obj, camera=camera, width=width, height=height
+        )
     camera = zpy.camera.verify(camera)
     obj = zpy.objects.verify(obj)
     if not isinstance(location, mathutils.Vector):
@@ -281,3 +287,88 @@ def camera_xyv(
     y = int(y * height)
     log.debug(f"(x, y, v) {(x, y, v)}")
     return x, y, v
+
+
+def _fisheye_lens_bound() -> bool:
+    """Whether camera_xyz has fisheye_lens turned on in the gin config."""
+    try:
+        return bool(gin.query_parameter("zpy.camera.camera_xyz.fisheye_lens"))
+    except ValueError:
+        return False
+
+
+def camera_xyv_batch(
+    locations: Union[List[Tuple[float]], np.ndarray],
+    obj: Union[bpy.types.Object, str],
+    camera: Union[bpy.types.Object, bpy.types.Camera, str] = None,
+    width: int = 640,
+    height: int = 480,
+) -> np.ndarray:
+    """Get camera image xyv coordinates for many points in scene at once.
+
+    Same as camera_xyv, but the points are projected into the camera
+    with a single matrix multiply (same math as world_to_camera_view).
+    Only the visibility ray casts are done one point at a time.
+
+    Args:
+        locations (Union[List[Tuple[float]], np.ndarray]): (N, 3) locations of points in 3D space.
+        obj (Union[bpy.types.Object, str]): Scene object (or it's name) to check for visibility.
+        camera (Union[bpy.types.Object, bpy.types.Camera, str]): Camera in which pixel space exists.
+        width (int, optional): Width of image. Defaults to 640.
+        height (int, optional): Height of image. Defaults to 480.
+
+    Returns:
+        np.ndarray: (N, 3) integer array of (X, Y, V)
+    """
+    camera = zpy.camera.verify(camera)
+    obj = zpy.objects.verify(obj)
+    locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+    if _fisheye_lens_bound():
+        # The fisheye correction in camera_xyz only works one point at a time
+        xyv = [
+            camera_xyv(location, obj, camera=camera, width=width, height=height)
+            for location in locations.tolist()
+        ]
+        return np.array(xyv, dtype=int).reshape(-1, 3)
+    scene = zpy.blender.verify_blender_scene()
+    # Points in camera space, camera looks down the -Z axis
+    world_to_camera = np.array(camera.matrix_world.normalized().inverted())
+    co_local = locations @ world_to_camera[:3, :3].T + world_to_camera[:3, 3]
+    z = -co_local[:, 2]
+    # Camera frame corners: top right, bottom right, bottom left
+    frame = np.array([v[:] for v in camera.data.view_frame(scene=scene)[:3]])
+    if camera.data.type != "ORTHO":
+        # Scale the frame to the depth of each point
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = -z / frame[0, 2]
+    else:
+        scale = np.ones_like(z)
+    min_x, max_x = frame[2, 0] * scale, frame[1, 0] * scale
+    min_y, max_y = frame[1, 1] * scale, frame[0, 1] * scale
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (co_local[:, 0] - min_x) / (max_x - min_x)
+        y = (co_local[:, 1] - min_y) / (max_y - min_y)
+    if camera.data.type != "ORTHO":
+        # Points on the camera plane end up in the middle of the frame
+        on_plane = z == 0.0
+        x[on_plane] = 0.5
+        y[on_plane] = 0.5
+    # visibility
+    v = np.full(locations.shape[0], 2)
+    v[(x < 0) | (y < 0) | (z < 0)] = 1
+    view_layer = zpy.blender.verify_view_layer()
+    camera_location = camera.location
+    for i, location in enumerate(locations.tolist()):
+        result = scene.ray_cast(
+            depsgraph=view_layer.depsgraph,
+            origin=camera_location,
+            direction=(mathutils.Vector(location) - camera_location),
+        )
+        if not result[0] or not is_child_hit(obj, result[4]):
+            v[i] = 1
+    # bottom-left to top-left
+    y = 1 - y
+    # float (0, 1) to pixel int (0, pixel size)
+    x = (x * width).astype(int)
+    y = (y * height).astype(int)
+    return np.stack([x, y, v], axis=1)
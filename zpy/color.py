@@ -5,31 +5,44 @@ import logging
 from pathlib import Path
 from typing import List, Tuple, Union
 
+import numpy as np
+
 import zpy
 
 log = logging.getLogger(__name__)
 
-# Random colors are loaded on module import
+# Random colors are loaded lazily on first use
 RANDOM_COLOR_IDX = 1
 COLORS_FILE = "colors.json"
 COLORS = None
-
-
-def reset(random_color_idx: int = 1):
-    """Load colors from file and reset random idx."""
-    global COLORS, RANDOM_COLOR_IDX
-    _path = Path(__file__).parent / COLORS_FILE
-    zpy.files.verify_path(_path)
-    COLORS = zpy.files.read_json(_path)
+# Colors pre-converted on load: (name, hex, irgb, frgb, frgba)
+_COLOR_TABLE = None
+
+
+def reset(random_color_idx: int = 1, reload: bool = False):
+    """Load colors from file (only once, unless reload) and reset random idx."""
+    global COLORS, _COLOR_TABLE, RANDOM_COLOR_IDX
+    if COLORS is None or reload:
+        COLORS = zpy.files.read_json(Path(__file__).parent / COLORS_FILE)
+        _hex_values = [_color["hex"] for _color in COLORS]
+        _irgbs = hex_to_irgb_batch(_hex_values).tolist()
+        _frgbs = hex_to_frgb_batch(_hex_values).tolist()
+        _COLOR_TABLE = [
+            (
+                _color["name"],
+                _color["hex"],
+                tuple(_irgb),
+                tuple(_frgb),
+                frgb_to_frgba(_frgb),
+            )
+            for _color, _irgb, _frgb in zip(COLORS, _irgbs, _frgbs)
+        ]
     RANDOM_COLOR_IDX = random_color_idx
 
 
 def hex_to_irgb(hex_value: str) -> Tuple[int]:
     """Convert hex value to integer rgb (0 to 255)."""
-    hex_value = int(hex_value[1:], 16)
-    b = hex_value & 0xFF
-    g = (hex_value >> 8) & 0xFF
-    r = (hex_value >> 16) & 0xFF
+    r, g, b = bytes.fromhex(hex_value[1:7])
     return r, g, b
 
 
@@ -50,10 +63,26 @@ def irgb_to_frgb(irgb: Tuple[int]) -> Tuple[float]:
     return tuple((x / max_rgb_value) for x in irgb)
 
 
+def hex_to_irgb_batch(hex_values: List[str]) -> np.ndarray:
+    """Convert a list of hex values to an N x 3 array of integer rgb (0 to 255)."""
+    _bytes = bytes.fromhex("".join(hex_value[1:7] for hex_value in hex_values))
+    return np.frombuffer(_bytes, dtype=np.uint8).reshape(-1, 3)
+
+
+def hex_to_frgb_batch(hex_values: List[str]) -> np.ndarray:
+    """Convert a list of hex values to an N x 3 array of float rgb (0 to 1)."""
+    return hex_to_irgb_batch(hex_values) / 255.0
+
+
+def irgb_to_hex_batch(irgb: np.ndarray) -> List[str]:
+    """Convert an N x 3 array of integer rgb (0 to 255) to a list of hex values."""
+    _hex = np.asarray(irgb, dtype=np.uint8).reshape(-1, 3).tobytes().hex()
+    return ["#" + _hex[i : i + 6] for i in range(0, len(_hex), 6)]
+
+
 def irgb_to_hex(irgb: Tuple[int]) -> str:
     """Convert integer rgb (0 to 255) to hex."""
-    r, g, b = irgb
-    return "#%02x%02x%02x" % (r, g, b)
+    return "#" + bytes(irgb[:3]).hex()
 
 
 def frgb_to_irgb(frgb: Tuple[float]) -> Tuple[int]:
@@ -67,11 +96,14 @@ def frgb_to_hex(frgb: Tuple[float]) -> str:
     return irgb_to_hex(frgb_to_irgb(frgb))
 
 
+# Exponent used for the (approximate) sRGB gamma correction
+EXPONENT_SRGB = 1 / 2.2
+
+
 def _gamma_correction(channel: float) -> float:
     """Convert float rgb (0 to 1) to the gamma-corrected sRGB float (0 to 1)
     for a single color channel."""
-    exponent_srgb = 1 / 2.2
-    return channel ** exponent_srgb
+    return channel ** EXPONENT_SRGB
 
 
 def frgb_to_srgb(frgb: Tuple[float]) -> Tuple[float]:
@@ -79,6 +111,15 @@ def frgb_to_srgb(frgb: Tuple[float]) -> Tuple[float]:
     return tuple(_gamma_correction(x) for x in frgb)
 
 
+def frgb_to_srgb_batch(frgb: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Convert an N x 3 array of float rgb (0 to 1) to gamma-corrected sRGB float (0 to 1).
+
+    Pass in out to write the result into an existing (float) array.
+    """
+    frgb = np.asarray(frgb, dtype=np.float64)
+    return np.power(frgb, EXPONENT_SRGB, out=out)
+
+
 def frgb_to_srgba(frgb: Tuple[float], a=1.0) -> Tuple[float]:
     """Convert float rgb (0 to 1) to the gamma-corrected sRGBA float (0 to 1)."""
     srgb = frgb_to_srgb(frgb)
@@ -86,37 +127,35 @@ def frgb_to_srgba(frgb: Tuple[float], a=1.0) -> Tuple[float]:
     return srgba
 
 
+# Output styles, looked up on entries of the pre-converted color table
+_OUTPUT_STYLES = {
+    "frgb": lambda c: c[3],
+    "frgba": lambda c: c[4],
+    "irgb": lambda c: c[2],
+    "hex": lambda c: c[1],
+    "name_irgb": lambda c: (c[0], c[2]),
+    "name_frgb": lambda c: (c[0], c[3]),
+    "name_frgba": lambda c: (c[0], c[4]),
+}
+
+
 def _output_style(
-    name: str, hex: str, output_style: str
+    color_entry: Tuple, output_style: str
 ) -> Union[Tuple[float, int, str], str]:
-    """Convert hex to an output style."""
-    if output_style == "frgb":
-        return hex_to_frgb(hex)
-    if output_style == "frgba":
-        return frgb_to_frgba(hex_to_frgb(hex))
-    elif output_style == "irgb":
-        return hex_to_irgb(hex)
-    elif output_style == "hex":
-        return hex
-    elif output_style == "name_irgb":
-        return name, hex_to_irgb(hex)
-    elif output_style == "name_frgb":
-        return name, hex_to_frgb(hex)
-    elif output_style == "name_frgba":
-        return name, frgb_to_frgba(hex_to_frgb(hex))
-    else:
+    """Convert an entry of the color table to an output style."""
+    _style = _OUTPUT_STYLES.get(output_style, None)
+    if _style is None:
         raise ValueError("Color must be frgb, irgb, or hex.")
+    return _style(color_entry)
 
 
 def default_color(output_style: str = "frgb") -> Union[Tuple[float, int, str], str]:
     """Default color."""
-    global COLORS
-    if COLORS is None:
+    if _COLOR_TABLE is None:
         reset()
-    _name = COLORS[0]["name"]
-    _hex = COLORS[0]["hex"]
-    log.debug(f"Default color chosen is {_name} - {_hex} - {hex_to_frgb(_hex)}")
-    return _output_style(_name, _hex, output_style=output_style)
+    _color = _COLOR_TABLE[0]
+    log.debug(f"Default color chosen is {_color[0]} - {_color[1]} - {_color[3]}")
+    return _output_style(_color, output_style=output_style)
 
 
 def random_color(output_style: str = "frgb") -> Union[Tuple[float, int, str], str]:
@@ -127,37 +166,34 @@ def random_color(output_style: str = "frgb") -> Union[Tuple[float, int, str], st
     color for a category.
 
     """
-    global RANDOM_COLOR_IDX, COLORS
-    if COLORS is None:
+    global RANDOM_COLOR_IDX
+    if _COLOR_TABLE is None:
         reset()
-    _name = COLORS[RANDOM_COLOR_IDX]["name"]
-    _hex = COLORS[RANDOM_COLOR_IDX]["hex"]
-    # Update global color idx
-    RANDOM_COLOR_IDX += 1
-    if RANDOM_COLOR_IDX > len(COLORS):
-        log.error("Ran out of unique colors!")
-    log.debug(f"Random color chosen is {_name} - {_hex} - {hex_to_frgb(_hex)}")
-    return _output_style(_name, _hex, output_style=output_style)
+    _color = _COLOR_TABLE[RANDOM_COLOR_IDX]
+    # Update global color idx, wrapping around past the default color
+    RANDOM_COLOR_IDX = RANDOM_COLOR_IDX % (len(_COLOR_TABLE) - 1) + 1
+    if RANDOM_COLOR_IDX == 1:
+        log.warning("Ran out of unique colors, re-using colors from the start.")
+    log.debug(f"Random color chosen is {_color[0]} - {_color[1]} - {_color[3]}")
+    return _output_style(_color, output_style=output_style)
 
 
 def closest_color(
     color: Tuple[float],
-    colors: List[Tuple[float]],
+    colors: Union[List[Tuple[float]], np.ndarray],
     max_dist: float = 0.01,
 ) -> Union[None, Tuple[float]]:
-    """Get the index of the closest color in a list to the input color."""
-    min_dist = 3.0
-    nearest_idx = 0
-    for i, _color in enumerate(colors):
-        dist = (
-            (color[0] - _color[0]) ** 2
-            + (color[1] - _color[1]) ** 2
-            + (color[2] - _color[2]) ** 2
-        )
-        if dist < min_dist:
-            min_dist = dist
-            nearest_idx = i
-    if min_dist > max_dist:
+    """Get the closest color in a list (or N x 3 array) to the input color."""
+    if len(colors) == 0:
+        log.debug("No colors to compare against")
+        return None
+    _colors = np.asarray(colors, dtype=np.float64)[:, :3]
+    diff = _colors - np.asarray(color, dtype=np.float64)[:3]
+    dists = np.einsum("ij,ij->i", diff, diff)
+    nearest_idx = int(dists.argmin())
+    if dists[nearest_idx] > max_dist:
         log.debug(f"No color close enough w/ maxmimum distance of {max_dist}")
         return None
+    if isinstance(colors, np.ndarray):
+        return tuple(colors[nearest_idx].tolist())
     return colors[nearest_idx]
@@ -1,23 +1,28 @@
 """
     File utilities.
 """
-import csv
+import functools
 import json
 import logging
 import os
 import random
 import re
 import shutil
-import subprocess
 import sys
-import tempfile
-import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from pprint import pformat
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterator, List, Tuple, Union
 
 log = logging.getLogger(__name__)
 
+# orjson is an optional (faster) json backend
+try:
+    import orjson
+except ModuleNotFoundError:
+    orjson = None
+    log.debug("Could not load orjson, using json instead.")
+
 
 """
 Dictionary of filename extensions and prefix/suffixes
@@ -30,51 +35,246 @@ catch-alls at the bottom.
 
 You can test these out at: https://regex101.com/
 """
-IMAGE_REGEX = ".*\.(jpeg|jpg|png|bmp)"
+IMAGE_REGEX = r".*\.(jpeg|jpg|png|bmp)"
 FILE_REGEX = {
     # Images
-    "instance segmentation image": ".*iseg" + IMAGE_REGEX,
-    "class segmentation image": ".*cseg" + IMAGE_REGEX,
-    "depth image": ".*depth" + IMAGE_REGEX,
-    "normal image": ".*normal" + IMAGE_REGEX,
-    "stereo left image": ".*.stereoL" + IMAGE_REGEX,
-    "stereo right image": ".*.stereoR" + IMAGE_REGEX,
-    "rgb image": ".*rgb" + IMAGE_REGEX,
+    "instance segmentation image": r".*iseg" + IMAGE_REGEX,
+    "class segmentation image": r".*cseg" + IMAGE_REGEX,
+    "depth image": r".*depth" + IMAGE_REGEX,
+    "normal image": r".*normal" + IMAGE_REGEX,
+    "stereo left image": r".*stereoL" + IMAGE_REGEX,
+    "stereo right image": r".*stereoR" + IMAGE_REGEX,
+    "rgb image": r".*rgb" + IMAGE_REGEX,
     "image": IMAGE_REGEX,
     # Annotations
-    "zumo annotation": "_annotations.zumo.json",
-    "coco annotation": ".*coco.*\.json",
-    "annotation": ".*\.(json|xml|yaml|csv)",
+    "zumo annotation": r"_annotations\.zumo\.json",
+    "coco annotation": r".*coco.*\.json",
+    "annotation": r".*\.(json|xml|yaml|csv)",
+}
+# Compiled once on import, use these when matching against many files
+FILE_REGEX_COMPILED = {
+    name: re.compile(pattern) for name, pattern in FILE_REGEX.items()
 }
+# All of FILE_REGEX fused into a single alternation so a filename is only
+# scanned once. Each branch is anchored with a lazy ".*?" so it behaves like
+# re.search, and the first matching branch wins just like the ordered dict.
+_FILE_REGEX_GROUPS = {f"_{i}": name for i, name in enumerate(FILE_REGEX)}
+FILE_REGEX_COMBINED = re.compile(
+    "|".join(
+        f"(?P<_{i}>.*?(?:{pattern}))" for i, pattern in enumerate(FILE_REGEX.values())
+    )
+)
+
+# Most dataset files are images, for which the FILE_REGEX image types boil down
+# to "tag appears before the image extension". Keep in sync with FILE_REGEX.
+_IMAGE_SUFFIXES = (".jpeg", ".jpg", ".png", ".bmp")
+_IMAGE_FILETYPE_TAGS = (
+    ("instance segmentation image", "iseg"),
+    ("class segmentation image", "cseg"),
+    ("depth image", "depth"),
+    ("normal image", "normal"),
+    ("stereo left image", "stereoL"),
+    ("stereo right image", "stereoR"),
+    ("rgb image", "rgb"),
+)
+
+
+def _match_filetype(
+    filename: str,
+    filetype_regex: Dict,
+) -> Union[str, None]:
+    """First filetype in a dict of {filetype : compiled regex} matching filename."""
+    if filetype_regex is FILE_REGEX_COMPILED:
+        if filename.endswith(_IMAGE_SUFFIXES):
+            # Tag must fit entirely before the extension, same as the regex
+            suffix_start = filename.rfind(".")
+            for name, tag in _IMAGE_FILETYPE_TAGS:
+                if filename.find(tag, 0, suffix_start) != -1:
+                    return name
+            return "image"
+        match = FILE_REGEX_COMBINED.match(filename)
+        if match is None:
+            return None
+        return _FILE_REGEX_GROUPS[match.lastgroup]
+    for name, re_pattern in filetype_regex.items():
+        if re_pattern.search(filename):
+            return name
+    return None
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_filetype_regex(
+    filetype_regex_items: Tuple[Tuple[str, str]],
+) -> Dict:
+    """Compile a custom {filetype : regex} dict, cached so repeated calls re-use it.
+
+    The returned dict is shared between calls, so do not modify it.
+    """
+    return {name: re.compile(re_pattern) for name, re_pattern in filetype_regex_items}
+
+
+def _list_dir(
+    dirpath: str,
+) -> Union[Tuple[List[os.DirEntry], List[str]], None]:
+    """List the file entries and sub-directory paths in a directory using os.scandir.
+
+    Returns None (with a warning) if the directory cannot be read.
+    """
+    file_entries, subdirs = [], []
+    try:
+        with os.scandir(dirpath) as it:
+            for entry in it:
+                if entry.is_dir():
+                    # Same as os.walk: do not follow symlinks to directories
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                else:
+                    file_entries.append(entry)
+    except OSError as e:
+        log.warning(f"Could not scan directory {dirpath}: {e}")
+        return None
+    return file_entries, subdirs
+
+
+def _scan_dir(
+    dirpath: str,
+    root_listing: Tuple[List[os.DirEntry], List[str]] = None,
+) -> Iterator[Tuple[str, List[os.DirEntry]]]:
+    """Walk a directory top-down (like os.walk) using os.scandir.
+
+    Yields each directory path along with the DirEntry of every file inside it,
+    so names and full paths come straight from the directory listing. The
+    listing of dirpath itself is re-used if one is passed in.
+    """
+    # Explicit stack instead of recursion, so deep trees do not pay for a chain
+    # of nested generators. Subdirs are pushed in reverse to keep os.walk order.
+    stack = [dirpath]
+    while stack:
+        dirpath = stack.pop()
+        if root_listing is not None:
+            listing, root_listing = root_listing, None
+        else:
+            listing = _list_dir(dirpath)
+        if listing is None:
+            continue
+        file_entries, subdirs = listing
+        yield dirpath, file_entries
+        stack.extend(reversed(subdirs))
+
+
+def _list_dir_task(
+    dirpath: str,
+    executor: ThreadPoolExecutor,
+) -> Union[Tuple[List[os.DirEntry], List[Tuple[str, Future]]], None]:
+    """List a directory and immediately queue up listings of its sub-directories."""
+    return _queue_subdirs(_list_dir(dirpath), executor)
+
+
+def _queue_subdirs(
+    listing: Union[Tuple[List[os.DirEntry], List[str]], None],
+    executor: ThreadPoolExecutor,
+) -> Union[Tuple[List[os.DirEntry], List[Tuple[str, Future]]], None]:
+    """Queue up listings of the sub-directories in a directory listing."""
+    if listing is None:
+        return None
+    file_entries, subdirs = listing
+    subdir_futures = [
+        (subdir, executor.submit(_list_dir_task, subdir, executor))
+        for subdir in subdirs
+    ]
+    return file_entries, subdir_futures
+
+
+def _scan_dir_parallel(
+    dirpath: str,
+    executor: ThreadPoolExecutor,
+    root_listing: Tuple[List[os.DirEntry], List[str]] = None,
+) -> Iterator[Tuple[str, List[os.DirEntry]]]:
+    """Same as _scan_dir, but the directories are listed by a pool of threads.
+
+    Every directory listing queues up its sub-directories as soon as it is done,
+    so the threads fan out over the whole tree, while the results are still
+    yielded in os.walk order.
+    """
+    if root_listing is None:
+        root_future = executor.submit(_list_dir_task, dirpath, executor)
+    else:
+        root_future = Future()
+        root_future.set_result(_queue_subdirs(root_listing, executor))
+    stack = [(dirpath, root_future)]
+    while stack:
+        dirpath, future = stack.pop()
+        listing = future.result()
+        if listing is None:
+            continue
+        file_entries, subdir_futures = listing
+        yield dirpath, file_entries
+        stack.extend(reversed(subdir_futures))
+
+
+def _collect_contents(
+    walk: Iterator[Tuple[str, List[os.DirEntry]]],
+    filetype_regex: Dict,
+) -> Dict:
+    """Sort the files found in a directory walk by filetype."""
+    contents = {
+        "dirs": [],
+    }
+    for dirpath, file_entries in walk:
+        contents["dirs"].append(dirpath)
+        for entry in file_entries:
+            name = _match_filetype(entry.name, filetype_regex)
+            if name is not None:
+                if contents.get(name, None) is None:
+                    contents[name] = []
+                contents[name].append(entry.path)
+    return contents
+
+
+# Starting a thread pool costs more than listing a small tree serially
+_PARALLEL_SCAN_MIN_SUBDIRS = 8
 
 
 def dataset_contents(
     path: Union[Path, str],
     filetype_regex: Dict = FILE_REGEX,
+    max_workers: int = None,
 ) -> Dict:
     """Use regex to search inside a data directory.
 
+    Directories with many sub-directories are listed by a pool of threads,
+    since most of the time is spent waiting on the filesystem (which releases
+    the GIL). Small trees are listed serially.
+
     Args:
         path (Union[Path, str]): Directory filepath.
         filetype_regex (Dict, optional): dictionary of {filetype : regex}
+        max_workers (int, optional): Number of threads used to list directories. By
+            default a pool of min(32, 4 * number of cpus) threads is only used when
+            the directory has more than a handful of sub-directories.
 
     Returns:
         Dict: Contents of directory.
     """
-    path = verify_path(path, check_dir=True, make=False)
-    contents = {
-        "dirs": [],
-    }
-    for dirpath, _, files in os.walk(path):
-        contents["dirs"].append(dirpath)
-        for filename in files:
-            for name, re_pattern in filetype_regex.items():
-                if re.search(re_pattern, filename):
-                    if contents.get(name, None) is None:
-                        contents[name] = []
-                    contents[name].append(os.path.join(dirpath, filename))
-                    break
-    return contents
+    path = verify_path(path, check_dir=True, make=False, resolve=True)
+    if filetype_regex is FILE_REGEX:
+        filetype_regex = FILE_REGEX_COMPILED
+    else:
+        filetype_regex = _compile_filetype_regex(tuple(filetype_regex.items()))
+    # The root listing decides whether to use threads, and is then re-used
+    root_listing = None
+    if max_workers is None:
+        root_listing = _list_dir(str(path))
+        if root_listing is None or len(root_listing[1]) <= _PARALLEL_SCAN_MIN_SUBDIRS:
+            max_workers = 1
+        else:
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+    if max_workers <= 1:
+        return _collect_contents(_scan_dir(str(path), root_listing), filetype_regex)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return _collect_contents(
+            _scan_dir_parallel(str(path), executor, root_listing), filetype_regex
+        )
 
 
 def file_is_of_type(
@@ -95,7 +295,7 @@ def file_is_of_type(
     assert (
         FILE_REGEX.get(filetype, None) is not None
     ), f"{filetype} must be in {FILE_REGEX.keys()}"
-    if re.search(FILE_REGEX[filetype], path):
+    if FILE_REGEX_COMPILED[filetype].search(path):
         return True
     return False
 
@@ -166,6 +366,11 @@ def make_custom_image_name(id: int, name: str, extension: str = ".png") -> str:
     return "image.%06d.%s" % (id, name) + extension
 
 
+# Image names look like "image.000001.rgb.png"
+_IMAGE_ID_SLICE = slice(6, 12)
+_NON_DIGIT_REGEX = re.compile(r"\D")
+
+
 def id_from_image_name(image_name: str) -> int:
     """Extract integer id from image name.
 
@@ -175,7 +380,15 @@ def id_from_image_name(image_name: str) -> int:
     Returns:
         int: Integer id.
     """
-    return int("".join([s for s in image_name if s.isdigit()]))
+    # Fast path for names made with the make_*_image_name functions above
+    _id = image_name[_IMAGE_ID_SLICE]
+    if (
+        image_name.startswith("image.")
+        and _id.isdigit()
+        and not image_name[12:13].isdigit()
+    ):
+        return int(_id)
+    return int(_NON_DIGIT_REGEX.sub("", image_name))
 
 
 def replace_id_in_image_name(image_name: str, new_id: int) -> str:
@@ -188,8 +401,8 @@ def replace_id_in_image_name(image_name: str, new_id: int) -> str:
     Returns:
         str: New image name.
     """
-    # HACK: This will break for image names without 8-digit indices
-    return "image.%06d" % new_id + image_name[12:]
+    # HACK: This will break for image names without 6-digit indices
+    return f"image.{new_id:06d}{image_name[_IMAGE_ID_SLICE.stop:]}"
 
 
 def add_to_path(path: Union[Path, str], name: str) -> Path:
@@ -202,22 +415,29 @@ def add_to_path(path: Union[Path, str], name: str) -> Path:
     Returns:
         Path: New path.
     """
+    # Path() drops trailing slashes, so "dir/" is treated like "dir"
     path = to_pathlib_path(path)
-    underscore_filename = path.stem + "_" + name + path.suffix
-    return path.parent / Path(underscore_filename)
+    return path.parent / f"{path.stem}_{name}{path.suffix}"
 
 
-def to_pathlib_path(path: Union[Path, str]) -> Path:
+def to_pathlib_path(
+    path: Union[Path, str],
+    resolve: bool = False,
+) -> Path:
     """Convert string path to pathlib.Path if needed.
 
     Args:
         path (Union[Path, str]): A filesystem path.
+        resolve (bool, optional): Make the path absolute and resolve symlinks. This hits
+            the filesystem, so only use it when the canonical path matters. Defaults to False.
 
     Returns:
         Path: Path in pathlib.Path format.
     """
     if not isinstance(path, Path):
-        path = Path(os.path.expandvars(path)).resolve()
+        path = Path(os.path.expandvars(path))
+    if resolve:
+        path = path.resolve()
     return path
 
 
@@ -227,6 +447,8 @@ def default_temp_path() -> Path:
     Returns:
         Path: Path to a new output folder in the temp path.
     """
+    import tempfile
+
     return Path(tempfile.gettempdir()) / "output"
 
 
@@ -243,14 +465,15 @@ def clean_dir(
     path = verify_path(path, make=False, check_dir=True)
     if keep_dir:
         # Delete the contents, but keep the directory
-        for _path in path.iterdir():
-            try:
-                if _path.is_file() or _path.is_symlink():
-                    _path.unlink()
-                elif _path.is_dir():
-                    shutil.rmtree(_path)
-            except Exception as e:
-                log.warning("Failed to delete %s. Reason: %s" % (_path, e))
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+                except Exception as e:
+                    log.warning("Failed to delete %s. Reason: %s" % (entry.path, e))
     else:
         # Delete everything, including the directory itself
         shutil.rmtree(path)
@@ -272,6 +495,7 @@ def verify_path(
     path: Union[Path, str],
     make: bool = False,
     check_dir: bool = False,
+    resolve: bool = False,
 ) -> Path:
     """Checks to make sure Path exists and optionally creates it.
 
@@ -279,6 +503,7 @@ def verify_path(
         path (Union[Path, str]): A filesystem path.
         make (bool, optional): Make the path if it does not exist. Defaults to False.
         check_dir (bool, optional): Throw error is path is not a directory. Defaults to False.
+        resolve (bool, optional): Return the absolute, resolved path. Defaults to False.
 
     Raises:
         ValueError: Path is not a directory (only if check_dir is set to True)
@@ -286,7 +511,7 @@ def verify_path(
     Returns:
         Path: The same path.
     """
-    path = to_pathlib_path(path)
+    path = to_pathlib_path(path, resolve=resolve)
     if not path.exists():
         log.warning(f"Could not find path at {path}")
         if make:
@@ -316,6 +541,8 @@ def write_json(
     if not path.suffix == ".json":
         raise ValueError(f"{path} is not a JSON file.")
     log.info(f"Writing JSON to file {path}")
+    # Always written with json: orjson would turn NaN into null and
+    # can only indent by 2, both of which change the output files.
     with path.open("w") as f:
         json.dump(data, f, indent=4)
 
@@ -338,6 +565,12 @@ def read_json(
     if not path.suffix == ".json":
         raise ValueError(f"{path} is not a JSON file.")
     log.info(f"Reading JSON file at {path}")
+    if orjson is not None:
+        try:
+            return orjson.loads(path.read_bytes())
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN/Infinity tokens, which json writes
+            log.debug(f"orjson could not parse {path}, using json instead.")
     with path.open() as f:
         data = json.load(f)
     return data
@@ -358,6 +591,8 @@ def write_csv(
     Raises:
         ValueError: Path is not a csv or txt file.
     """
+    import csv
+
     path = to_pathlib_path(path)
     if path.suffix not in [".csv", ".txt"]:
         raise ValueError(f"{path} is not a CSV file.")
@@ -382,6 +617,8 @@ def read_csv(path: Union[Path, str], delimiter: str = ",", **kwargs) -> List[Lis
     Returns:
         List[List[Any]]: Data in the csv.
     """
+    import csv
+
     path = to_pathlib_path(path)
     if path.suffix not in [".csv", ".txt"]:
         raise ValueError(f"{path} is not a CSV file.")
@@ -393,6 +630,25 @@ def read_csv(path: Union[Path, str], delimiter: str = ",", **kwargs) -> List[Lis
     return data
 
 
+@functools.lru_cache(maxsize=64)
+def _list_by_suffix(
+    dir_path: str,
+    suffixes: Tuple[str],
+    mtime_ns: int,
+) -> Tuple[str]:
+    """List the files with given suffixes in a directory.
+
+    The directory modification time is part of the cache key, so adding or
+    removing files in the directory invalidates the cached listing.
+    """
+    with os.scandir(dir_path) as entries:
+        return tuple(
+            entry.path
+            for entry in entries
+            if entry.name.endswith(suffixes) and entry.is_file()
+        )
+
+
 def pick_random_from_dir(
     dir_path: Union[Path, str],
     suffixes: List[str] = [".txt"],
@@ -406,11 +662,9 @@ def pick_random_from_dir(
     Returns:
         Path: Path to randomly chosen file with given suffix.
     """
-    _paths = []
-    for _path in dir_path.iterdir():
-        if _path.is_file() and _path.suffix in suffixes:
-            _paths.append(_path)
-    _path = random.choice(_paths)
+    dir_path = str(dir_path)
+    _paths = _list_by_suffix(dir_path, tuple(suffixes), os.stat(dir_path).st_mtime_ns)
+    _path = Path(random.choice(_paths))
     log.debug(f"Found {len(_paths)} files with suffix {suffixes} at {dir_path}")
     log.info(f"Randomly chose {_path}")
     return _path
@@ -439,20 +693,62 @@ def sample(
     return sample_images
 
 
+def _copy_file_range(
+    src_path: Union[Path, str],
+    dst_path: Union[Path, str],
+) -> None:
+    """Copy file contents in-kernel with os.copy_file_range (Linux only).
+
+    Raises:
+        OSError: Copy is not supported between these files.
+    """
+    with open(src_path, "rb") as fsrc:
+        if os.path.exists(dst_path) and os.path.samefile(src_path, dst_path):
+            raise shutil.SameFileError(f"{src_path} and {dst_path} are the same file")
+        with open(dst_path, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+
+
 def filecopy(
     src_path: Union[Path, str],
     dst_path: Union[Path, str],
+    copy_mode: bool = True,
 ) -> None:
     """Copy file from source (src) to destination (dst).
 
+    Uses os.copy_file_range when available so the data never leaves the
+    kernel (and can be reflinked on filesystems like btrfs/xfs).
+
     Args:
         src_path (Union[Path, str]): Source filesystem path.
-        dst_path (Union[Path, str]): Destination filesystem path.
+        dst_path (Union[Path, str]): Destination filesystem path (file or directory),
+            missing parent directories are created.
+        copy_mode (bool, optional): Also copy the permission bits. Defaults to True.
     """
-    src_path = verify_path(src_path)
-    dst_path = verify_path(dst_path)
+    # No verify_path here: opening the files raises if they are not there
+    src_path = to_pathlib_path(src_path)
+    dst_path = to_pathlib_path(dst_path)
+    if dst_path.is_dir():
+        dst_path = dst_path / src_path.name
+    else:
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
     log.debug(f"Copying over file from {src_path} to {dst_path}")
-    shutil.copy(src_path, dst_path)
+    try:
+        if not hasattr(os, "copy_file_range"):
+            raise OSError("os.copy_file_range is not available")
+        _copy_file_range(src_path, dst_path)
+    except shutil.SameFileError:
+        raise
+    except OSError as e:
+        log.debug(f"Falling back to shutil.copyfile: {e}")
+        shutil.copyfile(src_path, dst_path)
+    if copy_mode:
+        shutil.copymode(src_path, dst_path)
 
 
 def open_folder_in_explorer(
@@ -465,7 +761,9 @@ def open_folder_in_explorer(
         path (Union[Path, str]): Filesystem path.
         make (bool, optional): Make directory if it doesn't exist. Defaults to False.
     """
-    path = verify_path(path, check_dir=True, make=make)
+    import subprocess
+
+    path = verify_path(path, check_dir=True, make=make, resolve=True)
     if sys.platform.startswith("darwin"):
         subprocess.call(("open", path))
     elif os.name == "nt":
@@ -485,61 +783,138 @@ def remove_files_with_suffix(
         exts (List[str]): List of extensions to remove
     """
     path = verify_path(path, check_dir=True)
-    for _path in path.glob("*"):
-        if _path.suffix in exts:
-            log.info(f"Removing file at {_path}")
-            _path.unlink()
+    exts = set(exts)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1] in exts and entry.is_file():
+                log.info(f"Removing file at {entry.path}")
+                os.unlink(entry.path)
+
+
+# Small archives are faster to extract on a single thread
+_PARALLEL_UNZIP_MIN_MEMBERS = 16
+_PARALLEL_UNZIP_MIN_SIZE = 64 * 1024 * 1024
+
+
+def _extract_members(
+    zip_path: Path,
+    members: List,
+    out_path: Path,
+) -> None:
+    """Extract some members of a zip file, with a ZipFile handle of its own."""
+    import zipfile
+
+    with zipfile.ZipFile(str(zip_path)) as zf:
+        for member in members:
+            try:
+                zf.extract(member, out_path)
+            except FileExistsError:
+                # Another thread made the same parent directory at the same time
+                zf.extract(member, out_path)
 
 
 def unzip_file(
     zip_path: Union[Path, str],
     out_path: Union[Path, str],
+    max_workers: int = None,
 ) -> None:
     """Unzip a file to an output path.
 
+    Large archives are extracted by a pool of threads, each one decompressing
+    a share of the archive members.
+
     Args:
         zip_path (Union[Path, str]): Path to zip file.
         out_path (Union[Path, str]): Path to output directory.
+        max_workers (int, optional): Number of threads used to extract the archive.
+            Defaults to min(8, number of cpus).
 
     Raises:
         ValueError: Path isn't a zip.
     """
+    import zipfile
+
     log.info(f"Unzipping {zip_path} to {out_path}...")
     zip_path = verify_path(zip_path)
     out_path = verify_path(out_path, check_dir=True)
     if not zip_path.suffix == ".zip":
         raise ValueError(f"{zip_path} is not a zip file")
-    zf = zipfile.ZipFile(str(zip_path))
-    zipped_size_mb = round(sum([i.compress_size for i in zf.infolist()]) / 1024 / 1024)
-    unzipped_size_mb = round(sum([i.file_size for i in zf.infolist()]) / 1024 / 1024)
-    log.info(f"Compressed: {zipped_size_mb}MB, actual: {unzipped_size_mb}MB.")
-    zf.extractall(out_path)
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+    with zipfile.ZipFile(str(zip_path)) as zf:
+        members = zf.infolist()
+        zipped_size, unzipped_size = 0, 0
+        for info in members:
+            zipped_size += info.compress_size
+            unzipped_size += info.file_size
+        zipped_size_mb = round(zipped_size / 1024 / 1024)
+        unzipped_size_mb = round(unzipped_size / 1024 / 1024)
+        log.info(f"Compressed: {zipped_size_mb}MB, actual: {unzipped_size_mb}MB.")
+        if (
+            max_workers <= 1
+            or len(members) < _PARALLEL_UNZIP_MIN_MEMBERS
+            or unzipped_size < _PARALLEL_UNZIP_MIN_SIZE
+        ):
+            zf.extractall(out_path)
+            log.info(f"Done extracting to {out_path}.")
+            return
+    # Deal out the members round-robin so each thread gets a similar share
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _extract_members, zip_path, members[i::max_workers], out_path
+            )
+            for i in range(max_workers)
+        ]
+        for future in futures:
+            future.result()
     log.info(f"Done extracting to {out_path}.")
 
 
 def zip_file(
     in_path: Union[Path, str],
     zip_path: Union[Path, str],
+    compresslevel: int = None,
 ) -> None:
     """Zip a directory to a path.
 
     Args:
         in_path (Union[Path, str]): Path to input directory.
         zip_path (Union[Path, str]): Path to zip file.
+        compresslevel (int, optional): DEFLATE compression level from 0 (none) to 9 (best),
+            1 is much faster for large datasets. Defaults to the zlib default (6).
 
     Raises:
         ValueError: Path isn't a zip.
     """
+    import zipfile
+
     log.info(f"Zipping {in_path} to {zip_path}...")
     in_path = verify_path(in_path)
     zip_path = verify_path(zip_path)
     if not zip_path.suffix == ".zip":
         raise ValueError(f"{zip_path} is not a zip file")
-    shutil.make_archive(
-        base_name=zip_path.parent / zip_path.stem, format="zip", root_dir=in_path
-    )
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    zipped_size, unzipped_size = 0, 0
+    with zipfile.ZipFile(
+        str(zip_path),
+        "w",
+        compression=zipfile.ZIP_DEFLATED,
+        compresslevel=compresslevel,
+    ) as zf:
+        # Same layout as shutil.make_archive: directory entries plus files
+        for dirpath, file_entries in _scan_dir(str(in_path)):
+            arc_dirpath = os.path.relpath(dirpath, in_path)
+            if arc_dirpath != os.curdir:
+                zf.write(dirpath, arc_dirpath)
+            for entry in file_entries:
+                if not entry.is_file():
+                    continue
+                zf.write(entry.path, os.path.join(arc_dirpath, entry.name))
+                zip_info = zf.infolist()[-1]
+                zipped_size += zip_info.compress_size
+                unzipped_size += zip_info.file_size
     log.info(f"Done zipping to {zip_path}.")
-    zf = zipfile.ZipFile(str(zip_path))
-    zipped_size_mb = round(sum([i.compress_size for i in zf.infolist()]) / 1024 / 1024)
-    unzipped_size_mb = round(sum([i.file_size for i in zf.infolist()]) / 1024 / 1024)
+    zipped_size_mb = round(zipped_size / 1024 / 1024)
+    unzipped_size_mb = round(unzipped_size / 1024 / 1024)
     log.info(f"Compressed: {zipped_size_mb}MB, actual: {unzipped_size_mb}MB.")
@@ -36,11 +36,12 @@ def replace_human_redable_kwargs(
     """
     log.info("Converting human readable bindings to gin...")
     for key, value in gin_bindings.items():
-        if human_conversion.get(key, None) is not None:
-            log.info(f"Converted {key} to {human_conversion[key]}")
-            yield human_conversion[key], value
+        if key in human_conversion:
+            gin_key = human_conversion[key]
+            log.debug(f"Converted {key} to {gin_key}")
         else:
-            yield key, value
+            gin_key = key
+        yield gin_key, value
 
 
 def parse_gin_bindings(
@@ -5,7 +5,7 @@ import logging
 import math
 import random
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Dict, Tuple, Union
 
 import bpy
 import mathutils
@@ -16,22 +16,31 @@ import zpy
 log = logging.getLogger(__name__)
 
 
-@gin.configurable
-def load_hdri(
-    path: Union[Path, str],
-    scale: Tuple[float] = (1.0, 1.0, 1.0),
-    random_z_rot: bool = True,
-) -> None:
-    """Load an HDRI from path.
+# Cached HDRI node names for each world node tree, {tree pointer : {key : node name}}
+_HDRI_NODES = {}
+
+
+def _hdri_nodes(scene: bpy.types.Scene) -> Dict[str, bpy.types.Node]:
+    """Get (or make) the world nodes used to show an HDRI in a scene.
+
+    The node graph is only built once per scene, later calls re-use the
+    cached nodes as long as the world node tree has not changed.
 
     Args:
-        path (Union[Path, str]): Path to the HDRI.
-        scale (Tuple[float], optional): Scale in (x, y, z). Defaults to (1.0, 1.0, 1.0).
-        random_z_rot (bool, optional): Randomly rotate HDRI around Z axis. Defaults to True.
+        scene (bpy.types.Scene): Scene to add the HDRI nodes to.
+
+    Returns:
+        Dict[str, bpy.types.Node]: The environment texture and world rotation nodes.
     """
-    scene = zpy.blender.verify_blender_scene()
     scene.world.use_nodes = True
     tree = scene.world.node_tree
+    cached = _HDRI_NODES.get(tree.as_pointer(), None)
+    if cached is not None:
+        # Nodes are looked up again by name, removed nodes come back as None
+        nodes = {key: tree.nodes.get(name, None) for key, name in cached.items()}
+        if all(node is not None for node in nodes.values()):
+            return nodes
+        log.debug(f"Cached HDRI nodes in scene {scene.name} were removed.")
     out_node = zpy.nodes.get_or_make(
         "World Output", "ShaderNodeOutputWorld", tree, pos=(0, 0)
     )
@@ -41,18 +50,10 @@ def load_hdri(
     env_node = zpy.nodes.get_or_make(
         "Environment Texture", "ShaderNodeTexEnvironment", tree, pos=(-400, 0)
     )
-    log.info(f"Loading HDRI at {path}")
-    path = zpy.files.verify_path(path, make=False)
-    env_node.image = bpy.data.images.load(str(path))
-    env_node.texture_mapping.scale = mathutils.Vector(scale)
     world_rot_node = zpy.nodes.get_or_make(
         "World Rotation", "ShaderNodeVectorRotate", tree, pos=(-550, 0)
     )
     world_rot_node.rotation_type = "Z_AXIS"
-    if random_z_rot:
-        world_rotation = random.uniform(0, math.pi)
-        log.debug(f"Rotating HDRI randomly along Z axis to {world_rotation}")
-        world_rot_node.inputs["Angle"].default_value = world_rotation
     texcoord_node = zpy.nodes.get_or_make(
         "Texture Coordinate", "ShaderNodeTexCoord", tree, pos=(-730, 0)
     )
@@ -61,6 +62,39 @@ def load_hdri(
     tree.links.new(bg_node.inputs[0], env_node.outputs[0])
     tree.links.new(env_node.inputs[0], world_rot_node.outputs[0])
     tree.links.new(world_rot_node.inputs[0], texcoord_node.outputs[0])
+    nodes = {
+        "env": env_node,
+        "world_rot": world_rot_node,
+    }
+    _HDRI_NODES[tree.as_pointer()] = {key: node.name for key, node in nodes.items()}
+    return nodes
+
+
+@gin.configurable
+def load_hdri(
+    path: Union[Path, str],
+    scale: Tuple[float] = (1.0, 1.0, 1.0),
+    random_z_rot: bool = True,
+) -> None:
+    """Load an HDRI from path.
+
+    Args:
+        path (Union[Path, str]): Path to the HDRI.
+        scale (Tuple[float], optional): Scale in (x, y, z). Defaults to (1.0, 1.0, 1.0).
+        random_z_rot (bool, optional): Randomly rotate HDRI around Z axis. Defaults to True.
+    """
+    scene = zpy.blender.verify_blender_scene()
+    nodes = _hdri_nodes(scene)
+    env_node = nodes["env"]
+    log.info(f"Loading HDRI at {path}")
+    path = zpy.files.verify_path(path, make=False, resolve=True)
+    # check_existing re-uses the image if this file was already loaded
+    env_node.image = bpy.data.images.load(str(path), check_existing=True)
+    env_node.texture_mapping.scale = mathutils.Vector(scale)
+    if random_z_rot:
+        world_rotation = random.uniform(0, math.pi)
+        log.debug(f"Rotating HDRI randomly along Z axis to {world_rotation}")
+        nodes["world_rot"].inputs["Angle"].default_value = world_rotation
 
 
 @gin.configurable
@@ -2,17 +2,12 @@
     Image utilties.
 """
 import logging
-from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, Tuple, Union
 
 import numpy as np
 from PIL import Image
-from scipy import ndimage as ndi
-from shapely.geometry import MultiPolygon, Polygon
-from skimage import color, exposure, img_as_uint, io, measure
-from skimage.morphology import binary_closing, binary_opening
-from skimage.transform import resize
 
 import gin
 import zpy
@@ -31,6 +26,8 @@ def open_image(
     Returns:
         np.ndarray: Image as numpy array.
     """
+    from skimage import io
+
     image_path = zpy.files.verify_path(image_path, make=False)
     img = None
     try:
@@ -45,13 +42,41 @@ def open_image(
     return img
 
 
+def open_image_u8(
+    image_path: Union[Path, str],
+) -> np.ndarray:
+    """Open image from path to a uint8 ndarray, without the alpha channel.
+
+    Unlike open_image, pixel values stay in (0, 255), which saves a float
+    conversion when the image is going to be saved again.
+
+    Args:
+        image_path (Union[Path, str]): Path to image.
+
+    Returns:
+        np.ndarray: Image as uint8 numpy array.
+    """
+    from skimage import img_as_ubyte, io
+
+    image_path = zpy.files.verify_path(image_path, make=False)
+    img = io.imread(image_path)
+    if img.ndim == 3 and img.shape[2] > 3:
+        log.debug("RGBA image detected!")
+        img = img[:, :, :3]
+    if img.dtype != np.uint8:
+        img = img_as_ubyte(img)
+    return img
+
+
 def remove_alpha_channel(image_path: Union[Path, str]) -> None:
     """Remove the alpha channel in an image (overwrites image).
 
     Args:
         image_path (Union[Path, str]): Path to image.
     """
-    img = open_image(image_path)
+    from skimage import io
+
+    img = open_image_u8(image_path)
     io.imsave(image_path, img)
     log.info(f"Saving image with no alpha channel at {image_path}")
 
@@ -70,8 +95,10 @@ def jpeg_compression(
     Returns:
         Path: Path to image.
     """
+    from skimage import io
+
     image_path = zpy.files.verify_path(image_path, make=False)
-    img = io.imread(image_path)
+    img = open_image_u8(image_path)
     # img = Image.open(image_path)
     # Make sure image is jpeg
     if not image_path.suffix == ".jpeg":
@@ -90,6 +117,8 @@ def resize_image(
 ) -> Path:
     """Resize an image (overwrites image).
 
+    Uses OpenCV for the resize when it is installed, scikit-image otherwise.
+
     Args:
         image_path (Union[Path, str]): Path to image.
         width (int, optional): Width of image. Defaults to 640.
@@ -98,11 +127,53 @@ def resize_image(
     Returns:
         Path: Path to image.
     """
-    img = open_image(image_path)
-    resized_img = resize(img, (height, width), anti_aliasing=True)
+    from skimage import img_as_ubyte, io
+
+    # OpenCV is an optional (faster) resize backend, a broken install
+    # (e.g. missing libGL) raises ImportError rather than ModuleNotFoundError
+    try:
+        import cv2
+    except ImportError:
+        cv2 = None
+        log.debug("Could not load cv2, using skimage resize instead.")
+
+    img = open_image_u8(image_path)
+    if cv2 is not None:
+        # Area interpolation is anti-aliased when downscaling
+        if width < img.shape[1] or height < img.shape[0]:
+            interpolation = cv2.INTER_AREA
+        else:
+            interpolation = cv2.INTER_LINEAR
+        resized_img = cv2.resize(img, (width, height), interpolation=interpolation)
+    else:
+        from skimage.transform import resize
+
+        resized_img = img_as_ubyte(resize(img, (height, width), anti_aliasing=True))
     io.imsave(image_path, resized_img)
 
 
+def _mean_std_dict(
+    mean: np.ndarray,
+    std: np.ndarray,
+    max_value: float,
+) -> Dict:
+    """Pixel mean and std dictionary in both (0, 1) and (0, 256) ranges."""
+    if max_value > 1:
+        std_256 = std
+        mean_256 = mean
+        std = std_256 / 256
+        mean = mean_256 / 256
+    else:
+        std_256 = std * 256.0
+        mean_256 = mean * 256.0
+    return {
+        "mean": mean,
+        "std": std,
+        "mean_256": mean_256,
+        "std_256": std_256,
+    }
+
+
 def pixel_mean_std(
     flat_images: List[np.ndarray],
 ) -> Dict:
@@ -116,22 +187,51 @@ def pixel_mean_std(
     """
     # HACK: Incorrect type assumption
     flat_images = flat_images[0]
-    if np.amax(flat_images) > 1:
-        std_256 = np.std(flat_images, axis=0)
-        mean_256 = np.mean(flat_images, axis=0)
-        std = std_256 / 256
-        mean = mean_256 / 256
-    else:
-        std = np.std(flat_images, axis=0)
-        mean = np.mean(flat_images, axis=0)
-        std_256 = std * 256.0
-        mean_256 = mean * 256.0
-    return {
-        "mean": mean,
-        "std": std,
-        "mean_256": mean_256,
-        "std_256": std_256,
-    }
+    return _mean_std_dict(
+        np.mean(flat_images, axis=0),
+        np.std(flat_images, axis=0),
+        np.amax(flat_images),
+    )
+
+
+def streaming_pixel_stats(
+    images: List[np.ndarray],
+) -> Dict:
+    """Return the pixel mean and std over all the pixels in a list of images.
+
+    Images are processed one at a time and the per-image statistics are
+    combined with Chan's parallel algorithm, so the pixels are never
+    flattened into a single array or subsampled.
+
+    Args:
+        images (List[np.ndarray]): List of images in ndarray form.
+
+    Raises:
+        ValueError: No pixels in any of the (H, W, C) images.
+
+    Returns:
+        Dict: Pixel means and std as floats and integers (256)
+    """
+    count, mean, m2, max_value = 0, 0.0, 0.0, -np.inf
+    for image in images:
+        dims = np.shape(image)
+        if len(dims) != 3:
+            continue
+        pixels = np.reshape(image, (dims[0] * dims[1], dims[2]))
+        n = pixels.shape[0]
+        if n == 0:
+            continue
+        image_mean = np.mean(pixels, axis=0, dtype=np.float64)
+        image_m2 = np.var(pixels, axis=0, dtype=np.float64) * n
+        delta = image_mean - mean
+        new_count = count + n
+        mean = mean + delta * n / new_count
+        m2 = m2 + image_m2 + delta ** 2 * count * n / new_count
+        count = new_count
+        max_value = max(max_value, np.amax(pixels))
+    if count == 0:
+        raise ValueError("Pixel stats need at least one non-empty (H, W, C) image.")
+    return _mean_std_dict(mean, np.sqrt(m2 / count), max_value)
 
 
 def flatten_images(
@@ -152,21 +252,21 @@ def flatten_images(
         dims = np.shape(image)
         if len(dims) == 3:
             flat_images.append(np.reshape(image, (dims[0] * dims[1], dims[2])))
-    flat_images = np.concatenate(flat_images, axis=0)
-    subsample = flat_images[np.random.randint(flat_images.shape[0], size=max_pixels), :]
+    # Sample pixel indices over all the images, then gather the sampled pixels
+    # image by image, so the images are never concatenated into one big array.
+    offsets = np.cumsum([0] + [flat_image.shape[0] for flat_image in flat_images])
+    pixel_idx = np.random.randint(offsets[-1], size=max_pixels)
+    image_idx = np.searchsorted(offsets, pixel_idx, side="right") - 1
+    subsample = np.empty(
+        (max_pixels, flat_images[0].shape[1]),
+        dtype=np.result_type(*flat_images),
+    )
+    for i, flat_image in enumerate(flat_images):
+        in_image = image_idx == i
+        subsample[in_image] = flat_image[pixel_idx[in_image] - offsets[i]]
     return [subsample]
 
 
-def pad_with(vector, pad_width, iaxis, kwargs):
-    """Pad a vector.
-
-    https://numpy.org/doc/stable/reference/generated/numpy.pad.html
-    """
-    pad_value = kwargs.get("padder", 10)
-    vector[: pad_width[0]] = pad_value
-    vector[-pad_width[1] :] = pad_value
-
-
 def binary_mask_to_rle(binary_mask) -> Dict:
     """Converts a binary mask to a RLE (run-length-encoded) dictionary.
 
@@ -174,14 +274,51 @@ def binary_mask_to_rle(binary_mask) -> Dict:
     """
     binary_mask = np.asfortranarray(binary_mask)
     rle = {"counts": [], "size": list(binary_mask.shape)}
-    counts = rle.get("counts")
-    for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order="F"))):
-        if i == 0 and value == 1:
-            counts.append(0)
-        counts.append(len(list(elements)))
+    flat_mask = binary_mask.ravel(order="F")
+    if flat_mask.size == 0:
+        return rle
+    # Run lengths are the distances between the indices where the value changes
+    changes = np.flatnonzero(flat_mask[1:] != flat_mask[:-1]) + 1
+    boundaries = np.concatenate(([0], changes, [flat_mask.size]))
+    counts = np.diff(boundaries).tolist()
+    # Counts always start with the number of zeros
+    if flat_mask[0] == 1:
+        counts.insert(0, 0)
+    rle["counts"] = counts
     return rle
 
 
+def _unique_colors(
+    img: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique colors in an image (sorted by row) and the color label of each pixel.
+
+    Same as np.unique(..., axis=0, return_inverse=True) over the pixels, but
+    each channel is encoded into a small integer code first, so the pixels are
+    uniqued as a single int64 key (a 1D sort) instead of row by row.
+    """
+    pixels = img.reshape(-1, img.shape[2])
+    channel_uniques = [np.unique(pixels[:, c]) for c in range(pixels.shape[1])]
+    if np.prod([float(len(values)) for values in channel_uniques]) >= 2**62:
+        # Too many distinct values to pack into an int64 key
+        unique_colors, labels = np.unique(pixels, axis=0, return_inverse=True)
+        return unique_colors, labels.reshape(img.shape[:2])
+    key = np.zeros(pixels.shape[0], dtype=np.int64)
+    channel_values = []
+    for channel, values in enumerate(channel_uniques):
+        codes = np.searchsorted(values, pixels[:, channel])
+        channel_values.append(values)
+        key = key * len(values) + codes
+    unique_keys, labels = np.unique(key, return_inverse=True)
+    # Decode the keys back into colors
+    unique_colors = np.empty((len(unique_keys), pixels.shape[1]), dtype=pixels.dtype)
+    for channel in reversed(range(pixels.shape[1])):
+        num_values = len(channel_values[channel])
+        unique_colors[:, channel] = channel_values[channel][unique_keys % num_values]
+        unique_keys = unique_keys // num_values
+    return unique_colors, labels.reshape(img.shape[:2])
+
+
 @gin.configurable
 def seg_to_annotations(
     image_path: Union[Path, str],
@@ -189,6 +326,7 @@ def seg_to_annotations(
     rle_segmentations: bool = False,
     float_annotations: bool = False,
     max_categories: int = 1000,
+    min_pixels: int = 3,
 ) -> List[Dict]:
     """Convert a segmentation image into bounding boxes and polygon segmentations.
 
@@ -198,6 +336,8 @@ def seg_to_annotations(
         rle_segmentations (bool, optional): Include RLE polygons in annotation dictionaries. Defaults to False.
         float_annotations (bool, optional): Include float (0, 1) bboxes/polygons in annotation dicts. Defaults False.
         max_categories (int, optional): Maximum number of categories allowed in an image. Defaults to 1000.
+        min_pixels (int, optional): Skip categories with fewer pixels than this. Smaller blobs would
+            not survive the binary opening anyway. Defaults to 3.
 
     Raises:
         ValueError: Too many categories (usually means segmentation image is not single colors)
@@ -205,12 +345,23 @@ def seg_to_annotations(
     Returns:
         List[Dict]: List of annotation dictionaries.
     """
+    from scipy import ndimage as ndi
+    from shapely.geometry import Polygon
+    from skimage import img_as_uint, io, measure
+    from skimage.morphology import binary_closing, binary_opening
+
     log.info(f"Extracting annotations from segmentation: {image_path}")
     image_path = zpy.files.verify_path(image_path, make=False)
     img = open_image(image_path)
     img_height, img_width = img.shape[0], img.shape[1]
-    # Unique colors represent each unique category
-    unique_colors = np.unique(img.reshape(-1, img.shape[2]), axis=0)
+    # Divide (x, y) coordinates and (x, y, width, height) boxes by these
+    xy_scale = np.array([img_width, img_height], dtype=np.float64)
+    bbox_scale = np.tile(xy_scale, 2)
+    # Unique colors represent each unique category, and the
+    # label image has the index of each pixel's color
+    unique_colors, color_labels = _unique_colors(img)
+    # Bounding box (as slices) of every color, in a single pass over the image
+    color_slices = ndi.find_objects(color_labels + 1)
     # Store bboxes, seg polygons, and area in annotations list
     annotations = []
     # Loop through each category
@@ -222,19 +373,28 @@ def seg_to_annotations(
         if all(np.equal(seg_color, np.zeros(3))):
             log.debug("Color is background.")
             continue
-        # Make an image mask for this category
-        masked_image = img.copy()
-        mask = (img != seg_color).any(axis=-1)
-        masked_image[mask] = np.zeros(3)
-        masked_image = color.rgb2gray(masked_image)
+        # Crop to the bounding box of this category, with a margin of 2 pixels
+        # so the opening and closing below give the same result as they
+        # would on the full image. Work per category now scales with
+        # the object size instead of the image size.
+        rows, cols = color_slices[i]
+        row_start, col_start = max(rows.start - 2, 0), max(cols.start - 2, 0)
+        crop = (
+            slice(row_start, min(rows.stop + 2, img_height)),
+            slice(col_start, min(cols.stop + 2, img_width)),
+        )
+        # Make a binary image mask for this category
+        masked_image = color_labels[crop] == i
+        # Skip the morphology and contouring for a few pixels of salt
+        if np.count_nonzero(masked_image) < min_pixels:
+            log.debug(f"Color {seg_color} has less than {min_pixels} pixels.")
+            continue
         if log.getEffectiveLevel() == logging.DEBUG:
             masked_image_name = (
                 str(image_path.stem) + f"_masked_{i}" + str(image_path.suffix)
             )
             masked_image_path = image_path.parent / masked_image_name
-            io.imsave(
-                masked_image_path, img_as_uint(exposure.rescale_intensity(masked_image))
-            )
+            io.imsave(masked_image_path, img_as_uint(color_labels == i))
         if remove_salt:
             # Remove "salt"
             # https://scikit-image.org/docs/dev/api/skimage.morphology
@@ -244,10 +404,19 @@ def seg_to_annotations(
             masked_image = binary_opening(masked_image)
         # HACK: Pad masked image so segmented objects that extend beyond
         #       image are properly contoured
-        masked_image = np.pad(masked_image, 1, pad_with, padder=False)
-        # RLE encoded segmentation from binary image
+        padded_image = np.zeros(
+            (masked_image.shape[0] + 2, masked_image.shape[1] + 2), dtype=bool
+        )
+        padded_image[1:-1, 1:-1] = masked_image
+        masked_image = padded_image
+        # RLE encoded segmentation from binary image (the full padded image)
         if rle_segmentations:
-            rle_segmentation = binary_mask_to_rle(masked_image)
+            full_masked_image = np.zeros((img_height + 2, img_width + 2), dtype=bool)
+            full_masked_image[
+                row_start : row_start + masked_image.shape[0],
+                col_start : col_start + masked_image.shape[1],
+            ] = masked_image
+            rle_segmentation = binary_mask_to_rle(full_masked_image)
         # Fill in the holes
         filled_masked_image = ndi.binary_fill_holes(masked_image)
         # Get countours for each blob
@@ -262,55 +431,35 @@ def seg_to_annotations(
         segmentations = []
         segmentations_float = []
         bboxes = []
-        bboxes_float = []
         areas = []
-        areas_float = []
-        polygons = []
+        polygon_bounds = []
         for contour in contours:
-            # Flip from (row, col) representation to (x, y)
-            # and subtract the padding pixel
-            for j in range(len(contour)):
-                row, col = contour[j]
-                contour[j] = (col - 1, row - 1)
+            # Flip from (row, col) representation to (x, y),
+            # subtract the padding pixel and move back from the crop
+            contour = contour[:, ::-1] + (col_start - 1, row_start - 1)
             # Make a polygon and simplify it
             poly = Polygon(contour)
             poly = poly.simplify(1.0, preserve_topology=True)
-            polygons.append(poly)
             # Segmentation
-            segmentation = np.array(poly.exterior.coords).ravel().tolist()
-            segmentations.append(segmentation)
-            segmentations_float.append(
-                [
-                    x / img_height if k % 2 == 0 else x / img_width
-                    for k, x in enumerate(segmentation)
-                ]
-            )
+            segmentation = np.asarray(poly.exterior.coords, dtype=np.float64)
+            segmentations.append(segmentation.ravel().tolist())
+            if float_annotations:
+                segmentations_float.append((segmentation / xy_scale).ravel().tolist())
             # Bounding boxes
+            polygon_bounds.append(poly.bounds)
             x, y, max_x, max_y = poly.bounds
             bbox = (x, y, max_x - x, max_y - y)
-            bbox_float = [
-                bbox[0] / img_width,
-                bbox[1] / img_height,
-                bbox[2] / img_width,
-                bbox[3] / img_height,
-            ]
             bboxes.append(bbox)
-            bboxes_float.append(bbox_float)
             # Areas
             areas.append(poly.area)
-            areas_float.append(poly.area / (img_width * img_height))
-        # Combine the polygons to calculate the bounding box and area
-        multi_poly = MultiPolygon(polygons)
-        x, y, max_x, max_y = multi_poly.bounds
+        # Combine the polygons to calculate the bounding box and area,
+        # same as a MultiPolygon but without building one
+        x = min(bounds[0] for bounds in polygon_bounds)
+        y = min(bounds[1] for bounds in polygon_bounds)
+        max_x = max(bounds[2] for bounds in polygon_bounds)
+        max_y = max(bounds[3] for bounds in polygon_bounds)
         bbox = (x, y, max_x - x, max_y - y)
-        area = multi_poly.area
-        bbox_float = [
-            bbox[0] / img_width,
-            bbox[1] / img_height,
-            bbox[2] / img_width,
-            bbox[3] / img_height,
-        ]
-        area_float = area / (img_width * img_height)
+        area = sum(areas)
         annotation = {
             "color": tuple(seg_color),
             # COCO standards
@@ -325,9 +474,79 @@ def seg_to_annotations(
             annotation["segmentation_rle"] = rle_segmentation
         if float_annotations:
             annotation["segmentation_float"] = segmentations_float
-            annotation["bbox_float"] = bbox_float
-            annotation["area_float"] = area_float
-            annotation["bboxes_float"] = bboxes_float
-            annotation["areas_float"] = areas_float
+            annotation["bbox_float"] = (np.array(bbox) / bbox_scale).tolist()
+            annotation["area_float"] = area / (img_width * img_height)
+            annotation["bboxes_float"] = (np.array(bboxes) / bbox_scale).tolist()
+            annotation["areas_float"] = (
+                np.array(areas) / (img_width * img_height)
+            ).tolist()
         annotations.append(annotation)
     return annotations
+
+
+def _map_images(
+    func: Callable,
+    image_paths: List[Union[Path, str]],
+    max_workers: int = None,
+    **kwargs,
+) -> List:
+    """Call func on each image path using a pool of threads.
+
+    Threads (rather than processes) keep the gin config of the caller, and
+    image io, numpy and most of scikit-image release the GIL.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(func, image_path, **kwargs) for image_path in image_paths
+        ]
+        return [future.result() for future in futures]
+
+
+def jpeg_compression_batch(
+    image_paths: List[Union[Path, str]],
+    max_workers: int = None,
+    **kwargs,
+) -> List[Path]:
+    """Add jpeg compression to many images in parallel (see jpeg_compression).
+
+    Args:
+        image_paths (List[Union[Path, str]]): Paths to images.
+        max_workers (int, optional): Number of threads. Defaults to the ThreadPoolExecutor default.
+
+    Returns:
+        List[Path]: Paths to images.
+    """
+    return _map_images(jpeg_compression, image_paths, max_workers=max_workers, **kwargs)
+
+
+def resize_image_batch(
+    image_paths: List[Union[Path, str]],
+    max_workers: int = None,
+    **kwargs,
+) -> None:
+    """Resize many images in parallel (see resize_image).
+
+    Args:
+        image_paths (List[Union[Path, str]]): Paths to images.
+        max_workers (int, optional): Number of threads. Defaults to the ThreadPoolExecutor default.
+    """
+    _map_images(resize_image, image_paths, max_workers=max_workers, **kwargs)
+
+
+def seg_to_annotations_batch(
+    image_paths: List[Union[Path, str]],
+    max_workers: int = None,
+    **kwargs,
+) -> List[List[Dict]]:
+    """Convert many segmentation images into annotations in parallel (see seg_to_annotations).
+
+    Args:
+        image_paths (List[Union[Path, str]]): Paths to segmentation images.
+        max_workers (int, optional): Number of threads. Defaults to the ThreadPoolExecutor default.
+
+    Returns:
+        List[List[Dict]]: List of annotation dictionaries for each image.
+    """
+    return _map_images(
+        seg_to_annotations, image_paths, max_workers=max_workers, **kwargs
+    )
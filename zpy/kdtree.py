@@ -2,42 +2,75 @@
     KDTree utilities for Blender Python.
 """
 import logging
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
 import bpy
 import gin
 import mathutils
 import numpy as np
+from scipy.spatial import cKDTree
 
 import zpy
 
 log = logging.getLogger(__name__)
 
 
+def _world_vertices(
+    collections: List[bpy.types.Collection],
+) -> np.ndarray:
+    """World coordinates of all the vertices in a collection of objects as a (N, 3) array."""
+    vertices = []
+    for obj in zpy.objects.for_obj_in_collections(collections):
+        # Dump all the local coordinates at once, then transform them together
+        co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", co)
+        matrix_world = np.array(obj.matrix_world)
+        vertices.append(
+            co.reshape(-1, 3) @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+        )
+    if len(vertices) == 0:
+        return np.empty((0, 3))
+    return np.concatenate(vertices)
+
+
 def kdtree_from_collection(
     collections: List[bpy.types.Collection],
 ) -> mathutils.kdtree.KDTree:
     """Creates a KDTree of vertices from a collection of objects."""
-    # First get the size of the objects (number of vertices)
-    size = 0
-    for obj in zpy.objects.for_obj_in_collections(collections):
-        size += len(obj.data.vertices)
-    # Then add them to a tree object
-    kd = mathutils.kdtree.KDTree(size)
-    insert_idx = 0
-    for obj in zpy.objects.for_obj_in_collections(collections):
-        for v in obj.data.vertices:
-            world_coordinate_v = obj.matrix_world @ v.co
-            kd.insert(world_coordinate_v, insert_idx)
-            insert_idx += 1
+    vertices = _world_vertices(collections)
+    kd = mathutils.kdtree.KDTree(len(vertices))
+    for insert_idx, world_coordinate_v in enumerate(vertices.tolist()):
+        kd.insert(world_coordinate_v, insert_idx)
     # Balancing is the most expensive operation
     kd.balance()
     return kd
 
 
+def scipy_kdtree_from_collection(
+    collections: List[bpy.types.Collection],
+) -> cKDTree:
+    """Creates a scipy KDTree of vertices from a collection of objects.
+
+    Unlike the mathutils KDTree, this one can be queried with many points at
+    once, which makes the occupancy functions below much faster.
+    """
+    return cKDTree(_world_vertices(collections))
+
+
+def _closest_points(
+    kdtree: Union[mathutils.kdtree.KDTree, cKDTree],
+    points: np.ndarray,
+) -> np.ndarray:
+    """Closest point in the kdtree for each one of the (N, 3) query points."""
+    if isinstance(kdtree, cKDTree):
+        _, idx = kdtree.query(points, k=1)
+        return kdtree.data[idx]
+    return np.array([kdtree.find(point)[0] for point in points.tolist()])
+
+
 @gin.configurable
 def floor_occupancy(
-    kdtree: mathutils.kdtree.KDTree,
+    kdtree: Union[mathutils.kdtree.KDTree, cKDTree],
     x_bounds: Tuple[float],
     y_bounds: Tuple[float],
     z_height: float = 0.0,
@@ -51,28 +84,25 @@ def floor_occupancy(
     voxel_cube_side_length = ((x_side_length * y_side_length) / num_voxels) ** (1 / 2)
     num_points_x = x_side_length / voxel_cube_side_length
     num_points_y = y_side_length / voxel_cube_side_length
-    # TODO: This can definitely be vectorized better
     x_space, x_step = np.linspace(*x_bounds, num=int(num_points_x), retstep=True)
     y_space, y_step = np.linspace(*y_bounds, num=int(num_points_y), retstep=True)
-    occupancy_grid = np.zeros((int(num_points_x), int(num_points_y)))
-    for x_idx, x in enumerate(x_space):
-        for y_idx, y in enumerate(y_space):
-            x = float(x)
-            y = float(y)
-            closest_point = kdtree.find((x, y, z_height))[0]
-            if (closest_point.x > (x - x_step)) and (closest_point.x < (x + x_step)):
-                if (closest_point.y > (y - y_step)) and (
-                    closest_point.y < (y + y_step)
-                ):
-                    occupancy_grid[x_idx][y_idx] = 1.0
+    # Query the closest point to every grid point at once
+    grid_x, grid_y = np.meshgrid(x_space, y_space, indexing="ij")
+    grid_points = np.stack(
+        [grid_x.ravel(), grid_y.ravel(), np.full(grid_x.size, z_height)], axis=1
+    )
+    closest_points = _closest_points(kdtree, grid_points)
+    distances = np.abs(closest_points - grid_points)
+    occupied = (distances[:, 0] < x_step) & (distances[:, 1] < y_step)
+    occupancy_grid = occupied.reshape(grid_x.shape).astype(np.float64)
     log.info("... Done.")
     log.debug(f"Floor occupancy grid: {str(occupancy_grid)}")
-    return float(np.mean(occupancy_grid.copy()))
+    return float(occupancy_grid.mean())
 
 
 @gin.configurable
 def volume_occupancy(
-    kdtree: mathutils.kdtree.KDTree,
+    kdtree: Union[mathutils.kdtree.KDTree, cKDTree],
     x_bounds: Tuple[float],
     y_bounds: Tuple[float],
     z_bounds: Tuple[float],
@@ -90,28 +120,20 @@ def volume_occupancy(
     num_points_x = x_side_length / voxel_cube_side_length
     num_points_y = y_side_length / voxel_cube_side_length
     num_points_z = z_side_length / voxel_cube_side_length
-    # TODO: This can definitely be vectorized better
     x_space, x_step = np.linspace(*x_bounds, num=int(num_points_x), retstep=True)
     y_space, y_step = np.linspace(*y_bounds, num=int(num_points_y), retstep=True)
     z_space, z_step = np.linspace(*z_bounds, num=int(num_points_z), retstep=True)
-    occupancy_grid = np.zeros((int(num_points_x), int(num_points_y), int(num_points_z)))
-    for x_idx, x in enumerate(x_space):
-        for y_idx, y in enumerate(y_space):
-            for z_idx, z in enumerate(z_space):
-                x = float(x)
-                y = float(y)
-                z = float(z)
-                closest_point = kdtree.find((x, y, z))[0]
-                if (closest_point.x > (x - x_step)) and (
-                    closest_point.x < (x + x_step)
-                ):
-                    if (closest_point.y > (y - y_step)) and (
-                        closest_point.y < (y + y_step)
-                    ):
-                        if (closest_point.z > (z - z_step)) and (
-                            closest_point.z < (z + z_step)
-                        ):
-                            occupancy_grid[x_idx][y_idx][z_idx] = 1.0
+    # Query the closest point to every grid point at once
+    grid_x, grid_y, grid_z = np.meshgrid(x_space, y_space, z_space, indexing="ij")
+    grid_points = np.stack([grid_x.ravel(), grid_y.ravel(), grid_z.ravel()], axis=1)
+    closest_points = _closest_points(kdtree, grid_points)
+    distances = np.abs(closest_points - grid_points)
+    occupied = (
+        (distances[:, 0] < x_step)
+        & (distances[:, 1] < y_step)
+        & (distances[:, 2] < z_step)
+    )
+    occupancy_grid = occupied.reshape(grid_x.shape).astype(np.float64)
     log.info("... Done.")
     log.debug(f"Volume occupancy grid: {str(occupancy_grid)}")
-    return float(np.mean(occupancy_grid.copy()))
+    return float(occupancy_grid.mean())
@@ -5,6 +5,7 @@ import logging
 
 import bpy
 import gin
+import numpy as np
 
 import zpy
 
@@ -216,6 +217,15 @@ class Keypoints:
         self.style = style
         self.armature = armature
         self.bones = {bone.name: bone for bone in self.root.pose.bones}
+        # Look up the keypoint bones once, in keypoint order
+        self._bones = []
+        for name, bone_name in self.bone_lookup.items():
+            bone = self.bones.get(bone_name, None)
+            if bone is None:
+                log.warning(f"Could not find keypoint bone {name} using {bone_name}")
+            self._bones.append(bone)
+        # Reused every update for the bone head positions
+        self._heads = np.empty((len(self._bones), 3))
         self.num_keypoints = None
         self.keypoints_xyv = None
         self.keypoints_xyz = None
@@ -225,18 +235,16 @@ class Keypoints:
         world_transform=None,
     ) -> None:
         """Add a keypoint skeleton."""
-        self.num_keypoints = 0
-        self.keypoints_xyv = []
-        self.keypoints_xyz = []
-        for name, bone_name in self.bone_lookup.items():
-            bone = self.bones.get(bone_name, None)
-            if bone is None:
-                log.warning(f"Could not find keypoint bone {name} using {bone_name}")
-            if world_transform is None:
-                pos = self.root.matrix_world @ bone.head
-            else:
-                pos = world_transform @ self.root.matrix_world @ bone.head
-            x, y, v = zpy.camera.camera_xyv(pos, obj=self.root)
-            self.keypoints_xyv += [x, y, v]
-            self.keypoints_xyz += tuple(pos)
-            self.num_keypoints += 1
+        matrix_world = self.root.matrix_world
+        if world_transform is not None:
+            matrix_world = world_transform @ matrix_world
+        matrix_world = np.array(matrix_world)
+        # Pose bone heads are in armature space and move with the pose
+        for i, bone in enumerate(self._bones):
+            self._heads[i] = bone.head[:]
+        pos = self._heads @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+        # camera_xyv projects the whole array at once, with its gin bound image size
+        xyv = zpy.camera.camera_xyv(pos, obj=self.root)
+        self.num_keypoints = len(self._bones)
+        self.keypoints_xyv = xyv.ravel().tolist()
+        self.keypoints_xyz = pos.ravel().tolist()
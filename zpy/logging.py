@@ -2,51 +2,81 @@
     Logging utilities.
 """
 from pathlib import Path
-from typing import List, Union
+from typing import Iterator, Sequence, Union
 import numpy as np
+import atexit
+import functools
 import logging
+import logging.handlers
+import mmap
+import os
+import queue
 import shutil
 
 log = logging.getLogger(__name__)
 
+# Timing lines look like "Rendering took 1.23s to complete."
+_TIMING_PREFIXES = (b"Rendering took", b"Simulation step took")
+
+# Modules set_log_levels sets the level for by default
+_LOG_MODULES = (
+    "zpy",
+    "zpy_addon",
+    "bpy.zpy_addon",
+    "neuralyzer",
+    "bender",
+)
+
+# Log level names accepted by set_log_levels (None is the default)
+_LOG_LEVELS = {
+    None: logging.INFO,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+    "warning": logging.WARNING,
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _formatter(log_format: str) -> logging.Formatter:
+    """Log formatter for a format string, shared between calls."""
+    return logging.Formatter(log_format)
+
 
 def set_log_levels(
     level: str = None,
-    modules: List[str] = [
-        "zpy",
-        "zpy_addon",
-        "bpy.zpy_addon" "neuralyzer",
-        "bender",
-    ],
+    modules: Sequence[str] = _LOG_MODULES,
     log_format: str = "%(asctime)s: %(levelname)s %(filename)s] %(message)s",
 ) -> None:
     """Set logger levels for all zpy modules.
 
     Args:
         level (str, optional): log level in [info, debug, warning]. Defaults to logging.Info.
-        modules (List[str], optional): Modules to set logging for.
-            Defaults to [ 'zpy', 'zpy_addon', 'bpy.zpy_addon' 'neuralyzer', ].
+        modules (Sequence[str], optional): Modules to set logging for.
+            Defaults to [ 'zpy', 'zpy_addon', 'bpy.zpy_addon', 'neuralyzer', 'bender', ].
         log_format (str, optional): Log format string.
             Defaults to '%(asctime)s: %(levelname)s %(filename)s] %(message)s'
     """
-    if level is None:
-        log_level = logging.INFO
-    elif level == "info":
-        log_level = logging.INFO
-    elif level == "debug":
-        log_level = logging.DEBUG
-    elif level == "warning":
-        log_level = logging.WARNING
-    else:
-        log.warning(f"Invalid log level {level}")
+    log_level = _LOG_LEVELS.get(level, None)
+    if log_level is None:
+        log.warning("Invalid log level %s", level)
         return
+    # basicConfig does nothing when the root logger already has handlers,
+    # so (re)apply the format to the console handlers directly.
     logging.basicConfig(format=log_format)
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setFormatter(_formatter(log_format))
     for logger_name in modules:
-        try:
-            log.warning(f"Setting log level for {logger_name} to {log_level} ({level})")
-            logging.getLogger(logger_name).setLevel(log_level)
-        except Exception:
-            pass
+        log.warning(
+            "Setting log level for %s to %s (%s)", logger_name, log_level, level
+        )
+        logging.getLogger(logger_name).setLevel(log_level)
+
+
+@functools.lru_cache(maxsize=8)
+def _line_breaker(line_length: int) -> str:
+    """Line breaker ---- of a given length."""
+    return "-" * line_length
 
 
 def linebreaker_log(
@@ -61,11 +91,44 @@ def linebreaker_log(
     """
     # Clip the message
     message = message[:line_length]
-    whitespace = " " * int((line_length - len(message)) / 2)
+    whitespace = " " * ((line_length - len(message)) // 2)
+    line_breaker = _line_breaker(line_length)
     # La piece de resistance
-    log.info("-" * line_length)
-    log.info(f"{whitespace}{message.upper()}{whitespace}")
-    log.info("-" * line_length)
+    log.info(line_breaker)
+    log.info("%s%s%s", whitespace, message.upper(), whitespace)
+    log.info(line_breaker)
+
+
+# Log files are written in large chunks instead of a write per record
+_LOG_FILE_BUFFER_SIZE = 256 * 1024
+
+
+class _BufferedFileHandler(logging.FileHandler):
+    """FileHandler with a large write buffer, flushed on errors, flush and close."""
+
+    def _open(self):
+        return open(
+            self.baseFilename,
+            self.mode,
+            buffering=_LOG_FILE_BUFFER_SIZE,
+            encoding=self.encoding,
+        )
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            # Errors are written out right away in case the process dies
+            if record.levelno >= logging.ERROR:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+# Queue handler on the root logger and the listener thread writing the log files
+_FILE_LOG_HANDLER = None
+_FILE_LOG_LISTENER = None
 
 
 def setup_file_handlers(
@@ -75,26 +138,65 @@ def setup_file_handlers(
 ) -> None:
     """Output log files for requests
 
+    Log records are put on a queue by the root logger and written to the
+    files by a background thread, so logging does not block on file I/O.
+
     Args:
         error_log: output error.log
         debug_log: output debug.log
         log_dir: directory to output log files
     """
-    root = logging.getLogger()
+    global _FILE_LOG_HANDLER, _FILE_LOG_LISTENER
+    stop_file_handlers()
 
-    info_fh = logging.FileHandler(f"{log_dir}/info.log", mode="w")
+    info_fh = _BufferedFileHandler(f"{log_dir}/info.log", mode="w")
     info_fh.setLevel(logging.INFO)
-    root.addHandler(info_fh)
+    file_handlers = [info_fh]
 
     if error_log:
-        error_fh = logging.FileHandler(f"{log_dir}/error.log", mode="w")
+        error_fh = _BufferedFileHandler(f"{log_dir}/error.log", mode="w")
         error_fh.setLevel(logging.ERROR)
-        root.addHandler(error_fh)
+        file_handlers.append(error_fh)
 
     if debug_log:
-        debug_fh = logging.FileHandler(f"{log_dir}/debug.log", mode="w")
+        debug_fh = _BufferedFileHandler(f"{log_dir}/debug.log", mode="w")
         debug_fh.setLevel(logging.DEBUG)
-        root.addHandler(debug_fh)
+        file_handlers.append(debug_fh)
+
+    log_queue = queue.Queue(-1)
+    _FILE_LOG_HANDLER = logging.handlers.QueueHandler(log_queue)
+    _FILE_LOG_LISTENER = logging.handlers.QueueListener(
+        log_queue, *file_handlers, respect_handler_level=True
+    )
+    _FILE_LOG_LISTENER.start()
+    logging.getLogger().addHandler(_FILE_LOG_HANDLER)
+
+
+def flush_file_handlers() -> None:
+    """Write out all queued log records to the log files."""
+    if _FILE_LOG_LISTENER is not None:
+        # Stopping the listener processes the remaining records
+        _FILE_LOG_LISTENER.stop()
+        for handler in _FILE_LOG_LISTENER.handlers:
+            handler.flush()
+        _FILE_LOG_LISTENER.start()
+
+
+def stop_file_handlers() -> None:
+    """Write out all queued log records and close the log files."""
+    global _FILE_LOG_HANDLER, _FILE_LOG_LISTENER
+    if _FILE_LOG_LISTENER is None:
+        return
+    logging.getLogger().removeHandler(_FILE_LOG_HANDLER)
+    _FILE_LOG_LISTENER.stop()
+    for handler in _FILE_LOG_LISTENER.handlers:
+        handler.close()
+    _FILE_LOG_HANDLER = None
+    _FILE_LOG_LISTENER = None
+
+
+# Don't lose the queued records when the interpreter exits
+atexit.register(stop_file_handlers)
 
 
 def save_log_files(
@@ -107,33 +209,69 @@ def save_log_files(
         output_dir: directory to save log files
         log_dir: directory where logs exist
     """
+    flush_file_handlers()
     for log in ["info.log", "debug.log", "error.log"]:
         src = Path(log_dir) / log
         dst = Path(output_dir) / log
-        if src.exists() and src != dst:
-            shutil.copy(src, dst)
+        if not src.exists() or (dst.exists() and src.samefile(dst)):
+            continue
+        # No metadata to copy, copyfile can use the os.sendfile fast path
+        shutil.copyfile(src, dst)
+
+
+def _timing_lines(log_file: Union[str, Path]) -> Iterator[bytes]:
+    """Timing lines in a log file, found by searching a memory map of the file.
+
+    Only the lines containing " took " are sliced out of the map, the
+    rest of the file is never split into lines or decoded.
+    """
+    with open(log_file, "rb") as f:
+        # Empty files can not be memory mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(b" took ")
+            while pos != -1:
+                start = mm.rfind(b"\n", 0, pos) + 1
+                end = mm.find(b"\n", pos)
+                if end == -1:
+                    end = len(mm)
+                line = mm[start:end]
+                if line.startswith(_TIMING_PREFIXES):
+                    yield line
+                pos = mm.find(b" took ", end)
 
 
 def parse_log_file(log_file: Union[str, Path]) -> None:
-    import re
-
-    step_times, render_times = [], []
-    with open(log_file, "r") as f:
-        render_in_step = []
-        for line in f.readlines():
-            seconds = re.search("\d+\.\d+(?=s)", line)
-            if line.startswith("Rendering took"):
-                render_in_step.append(float(seconds.group(0)))
-            elif line.startswith("Simulation step took"):
-                render_times.append(render_in_step)
-                render_in_step = []
-                step_times.append(float(seconds.group(0)))
+    # Render times of all steps in one flat list, with the
+    # index where each step ends (renders are logged before the step)
+    step_times, all_render_times, step_ends = [], [], []
+    for line in _timing_lines(log_file):
+        # The seconds are the word after "took", with an "s" suffix
+        seconds = float(line.partition(b" took ")[2].split(None, 1)[0][:-1])
+        if line.startswith(b"Rendering took"):
+            all_render_times.append(seconds)
+        else:
+            step_ends.append(len(all_render_times))
+            step_times.append(seconds)
 
+    if not step_ends:
+        raise ValueError(f"No step timings found in {log_file}")
+    renders_per_step = np.diff(step_ends, prepend=0)
+    if np.any(renders_per_step != renders_per_step[0]):
+        raise ValueError(f"Steps in {log_file} have different numbers of renders")
+    avg_render_time = (
+        np.asarray(all_render_times[: step_ends[-1]], dtype=np.float64)
+        .reshape(len(step_ends), renders_per_step[0])
+        .mean(axis=0)
+        .tolist()
+    )
+    render_times = [
+        all_render_times[start:end] for start, end in zip([0] + step_ends, step_ends)
+    ]
     return {
         "avg_step_time": sum(step_times) / len(step_times),
-        "avg_render_time": [
-            v / len(render_times) for v in np.sum(render_times, axis=0)
-        ],
+        "avg_render_time": avg_render_time,
         "step_times": step_times,
         "render_times": render_times,
     }
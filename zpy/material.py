@@ -1,13 +1,14 @@
 """
     Utilities for Materials in Blender.
 """
+import collections
 import logging
-import copy
 import random
 from pathlib import Path
 from typing import Tuple, Union, List
 
 import bpy
+import numpy as np
 
 import gin
 import zpy
@@ -60,7 +61,7 @@ def for_mat_in_obj(
         if obj.active_material is not None:
             return obj.active_material
         else:
-            log.debug(f"No active material or material slots found for {obj.name}")
+            log.debug("No active material or material slots found for %s", obj.name)
             return None
 
 
@@ -75,7 +76,7 @@ def save_mat_props(
     Args:
         mat (Union[bpy.types.Material, str]):  Material (or it's name)
     """
-    log.info(f"Saving material properties for {mat.name}")
+    log.info("Saving material properties for %s", mat.name)
     _SAVED_MATERIALS[mat.name] = get_mat_props(mat)
 
 
@@ -87,7 +88,7 @@ def restore_mat_props(
     Args:
         mat (Union[bpy.types.Material, str]):  Material (or it's name)
     """
-    log.info(f"Restoring material properties for {mat.name}")
+    log.info("Restoring material properties for %s", mat.name)
     set_mat_props(mat, _SAVED_MATERIALS[mat.name])
 
 
@@ -97,6 +98,30 @@ def restore_all_mat_props() -> None:
         set_mat_props(mat_name, mat_props)
 
 
+def _get_bsdf_inputs(
+    mat: bpy.types.Material,
+) -> Tuple[bpy.types.NodeSocket]:
+    """Get the Principled BSDF input sockets of a material.
+
+    Args:
+        mat (bpy.types.Material): Material object.
+
+    Returns:
+        Tuple[bpy.types.NodeSocket]: Input sockets (roughness, metallic, specular), None if
+            the material has no BSDF node.
+    """
+    # TODO: Work backwards from Material output node instead of
+    #       assuming a 'Principled BSDF' node
+    bsdf_node = mat.node_tree.nodes.get("Principled BSDF", None)
+    if bsdf_node is None:
+        return None
+    return (
+        bsdf_node.inputs["Roughness"],
+        bsdf_node.inputs["Metallic"],
+        bsdf_node.inputs["Specular"],
+    )
+
+
 def get_mat_props(
     mat: Union[bpy.types.Material, str],
 ) -> Tuple[float]:
@@ -109,15 +134,11 @@ def get_mat_props(
         Tuple[float]: Material property values (roughness, metallic, specular).
     """
     mat = verify(mat)
-    bsdf_node = mat.node_tree.nodes.get("Principled BSDF")
-    if bsdf_node is None:
-        log.warning(f"No BSDF node in {mat.name}")
+    bsdf_inputs = _get_bsdf_inputs(mat)
+    if bsdf_inputs is None:
+        log.warning("No BSDF node in %s", mat.name)
         return (0.0, 0.0, 0.0)
-    return (
-        bsdf_node.inputs["Roughness"].default_value,
-        bsdf_node.inputs["Metallic"].default_value,
-        bsdf_node.inputs["Specular"].default_value,
-    )
+    return tuple(bsdf_input.default_value for bsdf_input in bsdf_inputs)
 
 
 def set_mat_props(
@@ -131,15 +152,14 @@ def set_mat_props(
         prop_tuple (Tuple[float]): Material property values (roughness, metallic, specular).
     """
     mat = verify(mat)
-    # TODO: Work backwards from Material output node instead of
-    #       assuming a 'Principled BSDF' node
-    bsdf_node = mat.node_tree.nodes.get("Principled BSDF", None)
-    if bsdf_node is None:
-        log.warning(f"No BSDF node in {mat.name}")
+    bsdf_inputs = _get_bsdf_inputs(mat)
+    if bsdf_inputs is None:
+        log.warning("No BSDF node in %s", mat.name)
         return
-    bsdf_node.inputs["Roughness"].default_value = copy.copy(prop_tuple[0])
-    bsdf_node.inputs["Metallic"].default_value = copy.copy(prop_tuple[1])
-    bsdf_node.inputs["Specular"].default_value = copy.copy(prop_tuple[2])
+    roughness_input, metallic_input, specular_input = bsdf_inputs
+    roughness_input.default_value = prop_tuple[0]
+    metallic_input.default_value = prop_tuple[1]
+    specular_input.default_value = prop_tuple[2]
 
 
 @gin.configurable
@@ -156,16 +176,41 @@ def jitter(
         save_first_time (bool, optional): Save the material props first time jitter is called and
             restore before jittering every subsequent time. Defaults to True.
     """
-    mat = verify(mat)
-    if save_first_time:
-        if _SAVED_MATERIALS.get(mat.name, None) is None:
-            save_mat_props(mat)
-        else:
-            restore_mat_props(mat)
-    log.info(f"Jittering material {mat.name}")
-    mat_props = get_mat_props(mat)
-    jittered_mat_props = tuple(map(lambda p: p + random.gauss(0, std), mat_props))
-    set_mat_props(mat, jittered_mat_props)
+    jitter_many([mat], std=std, save_first_time=save_first_time)
+
+
+@gin.configurable
+def jitter_many(
+    mats: List[Union[bpy.types.Material, str]],
+    std: float = 0.2,
+    save_first_time: bool = True,
+) -> None:
+    """Randomize many existing materials a little (see jitter).
+
+    The noise for all of the materials is drawn at once.
+
+    Args:
+        mats (List[Union[bpy.types.Material, str]]): Materials (or their names)
+        std (float, optional): Standard deviation of gaussian noise over material property. Defaults to 0.2.
+        save_first_time (bool, optional): Save the material props first time jitter is called and
+            restore before jittering every subsequent time. Defaults to True.
+    """
+    mats = [verify(mat) for mat in mats]
+    # Noise for (roughness, metallic, specular) of every material
+    noise = np.random.normal(0.0, std, size=(len(mats), 3))
+    for mat, mat_noise in zip(mats, noise):
+        if save_first_time:
+            if _SAVED_MATERIALS.get(mat.name, None) is None:
+                save_mat_props(mat)
+            else:
+                restore_mat_props(mat)
+        log.info("Jittering material %s", mat.name)
+        bsdf_inputs = _get_bsdf_inputs(mat)
+        if bsdf_inputs is None:
+            log.warning("No BSDF node in %s", mat.name)
+            continue
+        for bsdf_input, input_noise in zip(bsdf_inputs, mat_noise.tolist()):
+            bsdf_input.default_value += input_noise
 
 
 @gin.configurable
@@ -182,21 +227,17 @@ def random_mat(
         resegment (bool, optional): Re-segment the object after setting material. Defaults to True.
     """
     obj = verify(obj)
-    log.debug(f"Choosing random material for obj: {obj.name}")
+    log.debug("Choosing random material for obj: %s", obj.name)
     _mat = random.choice(list_of_mats)
     _mat = zpy.material.verify(_mat)
     zpy.material.set_mat(obj, _mat)
     if resegment:
         # Have to re-segment the object to properly
         # set the properties on the new material
-        zpy.objects.segment(
-            obj, name=obj.seg.instance_name, color=obj.seg.instance_color
-        )
-        zpy.objects.segment(
+        zpy.objects.segment_pair(
             obj,
-            as_category=True,
-            name=obj.seg.category_name,
-            color=obj.seg.category_color,
+            instance=(obj.seg.instance_name, obj.seg.instance_color),
+            category=(obj.seg.category_name, obj.seg.category_color),
         )
 
 
@@ -236,6 +277,32 @@ def filtered_dir_texture_mat(dir_name: Union[Path, str] = None) -> bpy.types.Mat
     return make_mat_from_texture(texture_path, name=texture_path.stem)
 
 
+_TEXTURE_MTIMES = {}
+
+
+def _load_texture_image(
+    texture_path: Path,
+) -> bpy.types.Image:
+    """Load a texture image, re-using the image if it was already loaded.
+
+    The image is only reloaded from disk when the file changed since it was loaded.
+
+    Args:
+        texture_path (Path): Path to texture image.
+
+    Returns:
+        bpy.types.Image: The texture image.
+    """
+    image = bpy.data.images.load(str(texture_path), check_existing=True)
+    mtime = texture_path.stat().st_mtime_ns
+    last_mtime = _TEXTURE_MTIMES.get(str(texture_path), None)
+    if last_mtime is not None and mtime > last_mtime:
+        log.debug("Texture %s changed on disk, reloading it.", texture_path)
+        image.reload()
+    _TEXTURE_MTIMES[str(texture_path)] = mtime
+    return image
+
+
 @gin.configurable
 def make_mat_from_texture(
     texture_path: Union[Path, str],
@@ -253,32 +320,39 @@ def make_mat_from_texture(
     Returns:
         bpy.types.Material: The newly created material.
     """
-    texture_path = zpy.files.verify_path(texture_path, make=False)
+    texture_path = zpy.files.verify_path(texture_path, make=False, resolve=True)
     if name is None:
         name = texture_path.stem
     mat = bpy.data.materials.get(name, None)
     if mat is None:
-        log.debug(f"Material {name} does not exist, creating it.")
+        log.debug("Material %s does not exist, creating it.", name)
         mat = bpy.data.materials.new(name=name)
     mat.use_nodes = True
-    bsdf_node = mat.node_tree.nodes.get("Principled BSDF")
-    out_node = mat.node_tree.nodes.get("Material Output")
-    tex_node = mat.node_tree.nodes.new("ShaderNodeTexImage")
-    tex_node.name = "ImageTexture"
-    coord_node = mat.node_tree.nodes.new("ShaderNodeTexCoord")
-    bpy.ops.image.open(filepath=str(texture_path))
-    tex_node.image = bpy.data.images[texture_path.name]
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    bsdf_node = nodes.get("Principled BSDF")
+    out_node = nodes.get("Material Output")
+    # Re-use the texture nodes of an existing material, only the
+    # image and links change instead of building new nodes every call
+    tex_node = nodes.get("ImageTexture", None)
+    if tex_node is None:
+        tex_node = nodes.new("ShaderNodeTexImage")
+        tex_node.name = "ImageTexture"
+    coord_node = nodes.get("TextureCoordinate", None)
+    if coord_node is None:
+        coord_node = nodes.new("ShaderNodeTexCoord")
+        coord_node.name = "TextureCoordinate"
+    tex_node.image = _load_texture_image(texture_path)
     tex_node.image.colorspace_settings.name = "Filmic Log"
-    mat.node_tree.links.new(tex_node.outputs[0], bsdf_node.inputs[0])
+    links.new(tex_node.outputs[0], bsdf_node.inputs[0])
     # TODO: Texture coordinate index is hardcoded
     valid_coordinates = ["generated", "normal", "uv", "object"]
     assert (
         coordinate in valid_coordinates
     ), f"Texture coordinate {coordinate} must be in {valid_coordinates}"
     _coord_idx = valid_coordinates.index(coordinate)
-    mat.node_tree.links.new(coord_node.outputs[_coord_idx], tex_node.inputs[0])
-    mat.node_tree.links.new(out_node.inputs[0], bsdf_node.outputs[0])
-    tex_node.image.reload()
+    links.new(coord_node.outputs[_coord_idx], tex_node.inputs[0])
+    links.new(out_node.inputs[0], bsdf_node.outputs[0])
     return mat
 
 
@@ -300,13 +374,19 @@ def make_mat_from_color(
         name = str(color)
     mat = bpy.data.materials.get(name, None)
     if mat is None:
-        log.debug(f"Material {name} does not exist, creating it.")
+        log.debug("Material %s does not exist, creating it.", name)
         mat = bpy.data.materials.new(name=name)
     mat.use_nodes = True
-    bsdf_node = mat.node_tree.nodes.get("Principled BSDF")
-    out_node = mat.node_tree.nodes.get("Material Output")
-    mat.node_tree.nodes.remove(bsdf_node)
-    bsdf_node = mat.node_tree.nodes.new("ShaderNodeBsdfDiffuse")
+    nodes = mat.node_tree.nodes
+    out_node = nodes.get("Material Output")
+    # Re-use the diffuse node of an existing material, only the color changes
+    bsdf_node = nodes.get("Diffuse BSDF", None)
+    if bsdf_node is None:
+        principled_node = nodes.get("Principled BSDF", None)
+        if principled_node is not None:
+            nodes.remove(principled_node)
+        bsdf_node = nodes.new("ShaderNodeBsdfDiffuse")
+        bsdf_node.name = "Diffuse BSDF"
     bsdf_node.inputs["Color"].default_value = color + (1.0,)
     mat.node_tree.links.new(out_node.inputs[0], bsdf_node.outputs[0])
     return mat
@@ -326,16 +406,40 @@ def set_mat(
     """
     obj = zpy.objects.verify(obj)
     mat = zpy.material.verify(mat)
-    if hasattr(obj, "active_material"):
-        log.debug(f"Setting object {obj.name} material {mat.name}")
-        obj.active_material = mat
-    else:
-        log.warning("Object does not have material property")
-        return
-    # Recursively change material on all children of object
-    if recursive:
-        for child in obj.children:
-            set_mat(child, mat)
+    # Walk the hierarchy breadth first, object and material are already resolved
+    objs_to_set = collections.deque([obj])
+    while objs_to_set:
+        obj = objs_to_set.popleft()
+        if not hasattr(obj, "active_material"):
+            log.warning("Object does not have material property")
+            continue
+        # Writing the same material again still tags the object for a depsgraph update
+        if obj.active_material != mat:
+            log.debug("Setting object %s material %s", obj.name, mat.name)
+            obj.active_material = mat
+        # Change material on all children of object
+        if recursive:
+            objs_to_set.extend(obj.children)
+
+
+def _has_aov_output(
+    tree: bpy.types.NodeTree,
+    style: str,
+) -> bool:
+    """Whether the style vertex color node is already linked to its AOV output node.
+
+    Only follows the links of the vertex color node, instead of
+    scanning every node in the tree.
+    """
+    vcol_node = tree.nodes.get(f"{style} Vertex Color", None)
+    if vcol_node is None or vcol_node.layer_name != style:
+        return False
+    for link in vcol_node.outputs["Color"].links:
+        # HACK: name is the AOV name for this node type (see below)
+        to_node = link.to_node
+        if to_node.bl_idname == "ShaderNodeOutputAOV" and to_node.name == style:
+            return True
+    return False
 
 
 @gin.configurable
@@ -358,7 +462,7 @@ def make_aov_material_output_node(
     scene = zpy.blender.verify_blender_scene()
     if not (scene.render.engine == "CYCLES"):
         log.warning(" Setting render engine to CYCLES to use AOV")
-        scene.render.engine == "CYCLES"
+        scene.render.engine = "CYCLES"
 
     # TODO: Refactor this legacy "styles" code
 
@@ -377,7 +481,7 @@ def make_aov_material_output_node(
     # Get material from object
     elif obj is not None:
         if obj.active_material is None:
-            log.debug(f"No active material found for {obj.name}")
+            log.debug("No active material found for %s", obj.name)
             return
         if len(obj.material_slots) > 1:
             for mat in obj.material_slots:
@@ -395,6 +499,10 @@ def make_aov_material_output_node(
             mat.use_nodes = True
         tree = mat.node_tree
 
+        # Skip materials that are already wired up for this style
+        if _has_aov_output(tree, style):
+            continue
+
         # Vertex Color Node
         vcol_node = zpy.nodes.get_or_make(
             f"{style} Vertex Color", "ShaderNodeVertexColor", tree
@@ -405,11 +513,16 @@ def make_aov_material_output_node(
         # HACK: This type of node has a "name" property which prevents using the
         # normal zpy.nodes code due to a scope conflict with the bpy.types.Node.name property
         # See: https://docs.blender.org/api/current/bpy.types.ShaderNodeOutputAOV.html
-        _name = style
-        aovout_node = None
-        for _node in tree.nodes:
-            if _node.name == _name:
-                aovout_node = _node
+        # Only runs the first time a material is set up, later calls
+        # are skipped by _has_aov_output above
+        aovout_node = next(
+            (
+                _node
+                for _node in tree.nodes
+                if _node.bl_idname == "ShaderNodeOutputAOV" and _node.name == style
+            ),
+            None,
+        )
         if aovout_node is None:
             aovout_node = tree.nodes.new("ShaderNodeOutputAOV")
         aovout_node.name = style
@@ -3,14 +3,105 @@
 """
 from typing import Dict, Union
 from pathlib import Path
+import atexit
 import json
+import queue
+import shutil
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 
+# requests_toolbelt is optional, it streams file uploads instead of
+# building the whole multipart body in memory
+try:
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ModuleNotFoundError:
+    MultipartEncoder = None
+
 ENDPOINT = "https://ragnarok.zumok8s.org/api/v1/experiment/"
 experiment = None
 logger = None
 
+# (connect, read) timeout in seconds for requests to the endpoint
+REQUEST_TIMEOUT = (10, 300)
+# Longest time to wait for queued updates when the interpreter exits
+EXIT_FLUSH_TIMEOUT = 60
+
+# Updates waiting to be sent by the upload thread, as (experiment,
+# file to upload, whether the file is a temporary copy, metrics json)
+_UPLOAD_QUEUE = queue.Queue(maxsize=1024)
+_UPLOAD_THREAD = None
+# Exceptions of the updates that failed since the last flush
+_UPLOAD_ERRORS = []
+
+
+def _upload_worker() -> None:
+    """Send queued experiment updates, so log() does not wait on the network."""
+    while True:
+        exp, file_path, is_copy, metrics_json = _UPLOAD_QUEUE.get()
+        try:
+            exp._update(file_path=file_path, metrics_json=metrics_json)
+        except Exception as e:
+            logging.getLogger(__name__).exception("Failed to upload experiment update")
+            _UPLOAD_ERRORS.append(e)
+        finally:
+            if is_copy:
+                shutil.rmtree(file_path.parent, ignore_errors=True)
+            _UPLOAD_QUEUE.task_done()
+
+
+def _start_upload_thread() -> None:
+    """Start the upload thread (once)."""
+    global _UPLOAD_THREAD
+    if _UPLOAD_THREAD is None:
+        _UPLOAD_THREAD = threading.Thread(target=_upload_worker, daemon=True)
+        _UPLOAD_THREAD.start()
+        atexit.register(_close_at_exit)
+
+
+def _close_at_exit() -> None:
+    """Send the updates still in the queue and close the experiment session.
+
+    Waits at most EXIT_FLUSH_TIMEOUT seconds, so an unreachable endpoint
+    does not hang the interpreter on exit.
+    """
+    flush(timeout=EXIT_FLUSH_TIMEOUT)
+    if experiment is not None:
+        experiment.close()
+
+
+def flush(timeout: float = None) -> bool:
+    """Wait until all logged updates have been sent.
+
+    Failed updates are logged by the upload thread as they happen, and
+    counted here so the caller can tell that updates were lost.
+
+    Args:
+        timeout (float, optional): Seconds to wait at most. Defaults to waiting until done.
+
+    Returns:
+        bool: Whether all updates were sent successfully.
+    """
+    with _UPLOAD_QUEUE.all_tasks_done:
+        done = _UPLOAD_QUEUE.all_tasks_done.wait_for(
+            lambda: _UPLOAD_QUEUE.unfinished_tasks == 0, timeout=timeout
+        )
+    if not done:
+        logging.getLogger(__name__).warning(
+            f"Gave up waiting for {_UPLOAD_QUEUE.unfinished_tasks} experiment updates"
+        )
+    num_errors = len(_UPLOAD_ERRORS)
+    if num_errors > 0:
+        del _UPLOAD_ERRORS[:num_errors]
+        logging.getLogger(__name__).error(
+            f"{num_errors} experiment updates failed to upload"
+        )
+        return False
+    return done
+
 
 def init(
     name: str,
@@ -38,28 +129,59 @@ def init(
         name=name, sim=sim, dataset=dataset, config=config, api_key=api_key
     )
     global experiment
+    if experiment is not None:
+        # Updates of the previous experiment still in the queue
+        # re-open a connection if they need one
+        experiment.close()
     experiment = exp
     exp._create()
+    _start_upload_thread()
 
 
 def log(
     metrics: str = None,
     file_path: str = None,
+    snapshot_file: bool = True,
 ) -> None:
     """Log an update to experiment.
 
+    The update is sent in the background, call flush to wait for it. The
+    metrics are copied first, so they can be changed right after.
+
+    By default the file is also copied (to a temporary directory) before this
+    returns, which takes time and disk space in proportion to the file size.
+    For large files that are not written to again, such as a checkpoint saved
+    under a new name, set snapshot_file to False to upload the file in place.
+
     Args:
         metrics (str, optional): free form dictionary of data to log
         file_path (str, optional): file path to upload
+        snapshot_file (bool, optional): Upload a copy of the file, so it can be
+            changed or removed right after. Defaults to True.
 
     Raises:
+        RuntimeError: if init was not called first
         FileNotFoundError: if file_path doesnt exist
     """
     global experiment
     exp = experiment
+    if exp is None:
+        raise RuntimeError("zpy.ml.init must be called before zpy.ml.log")
+    # Snapshot the metrics and the file, the caller may change them
+    # before the upload thread gets to this update
+    metrics_json = json.dumps(metrics) if metrics else None
+    upload_path, is_copy = None, False
     if file_path:
         file_path = Path(file_path).resolve()
-    exp._update(file_path=file_path, metrics=metrics)
+        if not file_path.exists():
+            raise FileNotFoundError(f"Could not find file to upload at {file_path}")
+        if snapshot_file:
+            upload_path = Path(tempfile.mkdtemp(prefix="zpy-upload-")) / file_path.name
+            shutil.copyfile(file_path, upload_path)
+            is_copy = True
+        else:
+            upload_path = file_path
+    _UPLOAD_QUEUE.put((exp, upload_path, is_copy, metrics_json))
 
 
 class Experiment:
@@ -86,28 +208,77 @@ class Experiment:
         self.sim = sim
         self.dataset = dataset
         self.config = config
+        # Encoded once, not on every request
+        self._config_json = json.dumps(config) if config else None
         self.auth_headers = {"Authorization": "token {}".format(api_key)}
         self.id = None
+        # Keep the connection alive between requests instead of
+        # a new connection (and TLS handshake) for every log call
+        self.session = requests.Session()
+        self.session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=2,
+                # PUT is not retried, a streamed upload body can't be sent twice
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS - {"PUT"},
+                ),
+            ),
+        )
+
+    def close(self) -> None:
+        """close the connection to the endpoint"""
+        self.session.close()
 
     def _post(self, data=None):
         """post to endpoint"""
-        r = requests.post(ENDPOINT, data=data, headers=self.auth_headers)
+        r = self.session.post(
+            ENDPOINT, data=data, headers=self.auth_headers, timeout=REQUEST_TIMEOUT
+        )
         if r.status_code != 201:
             logger.debug(f"{r.text}")
             r.raise_for_status()
         self.id = json.loads(r.text)["id"]
         logger.debug(f"{r.status_code}: {r.text}")
 
-    def _put(self, data=None, files=None):
+    def _put(self, data=None, file_path=None):
         """put to endpoint"""
-        r = requests.put(
-            f"{ENDPOINT}{self.id}/", data=data, files=files, headers=self.auth_headers
-        )
+        if file_path is None:
+            r = self.session.put(
+                f"{ENDPOINT}{self.id}/",
+                data=data,
+                headers=self.auth_headers,
+                timeout=REQUEST_TIMEOUT,
+            )
+        else:
+            with open(file_path, "rb") as f:
+                r = self._put_file(data=data, f=f)
         if r.status_code != 200:
             logger.debug(f"{r.text}")
             r.raise_for_status()
         logger.debug(f"{r.status_code}: {r.text}")
 
+    def _put_file(self, data, f):
+        """put to endpoint with a file, streamed if requests_toolbelt is installed"""
+        url = f"{ENDPOINT}{self.id}/"
+        if MultipartEncoder is None:
+            return self.session.put(
+                url,
+                data=data,
+                files={"file": f},
+                headers=self.auth_headers,
+                timeout=REQUEST_TIMEOUT,
+            )
+        file_field = (Path(f.name).name, f, "application/octet-stream")
+        encoder = MultipartEncoder(fields={**data, "file": file_field})
+        headers = {**self.auth_headers, "Content-Type": encoder.content_type}
+        return self.session.put(
+            url, data=encoder, headers=headers, timeout=REQUEST_TIMEOUT
+        )
+
     def _create(self):
         """request to create experiment"""
         data = {"name": self.name}
@@ -115,17 +286,17 @@ class Experiment:
             data["sim_name"] = self.sim
         if self.dataset:
             data["data_set_name"] = self.dataset
-        if self.config:
-            data["config"] = json.dumps(self.config)
+        if self._config_json:
+            data["config"] = self._config_json
         self._post(data=data)
 
-    def _update(self, file_path: Union[Path, str] = None, metrics: Dict = None) -> None:
+    def _update(
+        self, file_path: Union[Path, str] = None, metrics_json: str = None
+    ) -> None:
         """request to update experiment"""
         data = {"name": self.name}
-        if metrics:
-            data["metrics"] = json.dumps(metrics)
-        files = None
+        if metrics_json:
+            data["metrics"] = metrics_json
         if file_path:
-            files = {"file": open(file_path, "rb")}
             data["file_name"] = Path(file_path).name
-        self._put(data=data, files=files)
+        self._put(data=data, file_path=file_path)
@@ -4,11 +4,12 @@
 import logging
 import random
 from pathlib import Path
-from typing import List, Tuple, Union
+from typing import Dict, List, Tuple, Union
 
 import bpy
 import gin
 import mathutils
+import numpy as np
 import zpy
 
 log = logging.getLogger(__name__)
@@ -52,7 +53,7 @@ def load_blend_obj(
     Returns:
         bpy.types.Object: Scene object that was loaded in.
     """
-    path = zpy.files.verify_path(path, make=False)
+    path = zpy.files.verify_path(path, make=False, resolve=True)
     scene = zpy.blender.verify_blender_scene()
     with bpy.data.libraries.load(str(path), link=link) as (data_from, data_to):
         for from_obj in data_from.objects:
@@ -312,6 +313,60 @@ def segment(
             )
 
 
+def segment_pair(
+    obj: Union[bpy.types.Object, str],
+    instance: Tuple[str, Tuple[float]] = ("default", None),
+    category: Tuple[str, Tuple[float]] = ("default", None),
+    as_single: bool = False,
+) -> None:
+    """Segment an object as both an instance and a category.
+
+    Same as calling segment for the instance and then for the category, but the
+    vertex color layers of both are filled together.
+
+    Args:
+        obj (Union[bpy.types.Object, str]): Scene object (or it's name)
+        instance (Tuple[str, Tuple[float]], optional): Instance name and segmentation color.
+            Defaults to ('default', None).
+        category (Tuple[str, Tuple[float]], optional): Category name and segmentation color.
+            Defaults to ('default', None).
+        as_single (bool, optional): Segment all child objects as well. Defaults to False.
+    """
+    if "use_sculpt_vertex_colors" in dir(bpy.context.preferences.experimental):
+        bpy.context.preferences.experimental.use_sculpt_vertex_colors = True
+    obj = verify(obj)
+    instance_name, instance_color = instance
+    category_name, category_color = category
+    if instance_color is None:
+        instance_color = zpy.color.random_color(output_style="frgb")
+    if category_color is None:
+        category_color = zpy.color.random_color(output_style="frgb")
+    obj.color = zpy.color.frgb_to_frgba(category_color)
+    obj.seg.instance_name = instance_name
+    obj.seg.instance_color = instance_color
+    obj.seg.category_name = category_name
+    obj.seg.category_color = category_color
+    # Make sure object material is set up correctly with AOV nodes
+    _populate_vertex_colors(
+        obj,
+        {
+            "instance": zpy.color.frgb_to_frgba(instance_color),
+            "category": zpy.color.frgb_to_frgba(category_color),
+        },
+    )
+    zpy.material.make_aov_material_output_node(obj=obj, style="instance")
+    zpy.material.make_aov_material_output_node(obj=obj, style="category")
+    # Recursively add property to children objects
+    if as_single:
+        for child in obj.children:
+            segment_pair(
+                obj=child,
+                instance=(instance_name, instance_color),
+                category=(category_name, category_color),
+                as_single=as_single,
+            )
+
+
 def populate_vertex_colors(
     obj: Union[bpy.types.Object, str],
     color_rgba: Tuple[float],
@@ -324,24 +379,44 @@ def populate_vertex_colors(
         color_rgba (Tuple[float]): Segmentation color.
         seg_type (str, optional): Instance or Category segmentation. Defaults to 'instance'.
     """
-    obj = verify(obj)
+    _populate_vertex_colors(verify(obj), {seg_type: color_rgba})
+
+
+def _populate_vertex_colors(
+    obj: bpy.types.Object,
+    colors_rgba: Dict[str, Tuple[float]],
+) -> None:
+    """Fill Vertex Color Layers with colors.
+
+    Args:
+        obj (bpy.types.Object): Scene object.
+        colors_rgba (Dict[str, Tuple[float]]): Segmentation color for each seg type (layer name).
+    """
     if not obj.type == "MESH":
         log.warning(f"Object {obj.name} is not a mesh, has no vertices.")
         return
     # TODO: Is this select needed?
     # select(obj)
-    # Remove any existing vertex color data
-    if len(obj.data.sculpt_vertex_colors):
-        for vcol in obj.data.sculpt_vertex_colors.keys():
-            if seg_type in vcol:
-                obj.data.sculpt_vertex_colors.remove(
-                    obj.data.sculpt_vertex_colors[seg_type]
-                )
-    # Add new vertex color data
-    obj.data.sculpt_vertex_colors.new(name=seg_type)
-    # Iterate through each vertex in the mesh
-    for i, _ in enumerate(obj.data.vertices):
-        obj.data.sculpt_vertex_colors[seg_type].data[i].color = color_rgba
+    for seg_type in colors_rgba:
+        # Remove any existing vertex color data
+        if len(obj.data.sculpt_vertex_colors):
+            for vcol in obj.data.sculpt_vertex_colors.keys():
+                if seg_type in vcol:
+                    obj.data.sculpt_vertex_colors.remove(
+                        obj.data.sculpt_vertex_colors[seg_type]
+                    )
+        # Add new vertex color data
+        obj.data.sculpt_vertex_colors.new(name=seg_type)
+    # Get the layers only after adding all of them, adding
+    # or removing layers can move the layer data in memory
+    num_vertices = len(obj.data.vertices)
+    colors = np.empty((num_vertices, 4), dtype=np.float32)
+    for seg_type, color_rgba in colors_rgba.items():
+        # Write the color of every vertex in one bulk copy
+        colors[:] = color_rgba
+        obj.data.sculpt_vertex_colors[seg_type].data.foreach_set(
+            "color", colors.ravel()
+        )
 
 
 def random_position_within_constraints(
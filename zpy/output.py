@@ -51,5 +51,5 @@ class Output:
         if annotation_path is None:
             annotation_path = self.annotation_path
         log.info(f"Outputting annotation file to {annotation_path}")
-        annotation_path = zpy.files.verify_path(annotation_path)
+        annotation_path = zpy.files.verify_path(annotation_path, resolve=True)
         return annotation_path
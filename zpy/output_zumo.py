@@ -80,9 +80,9 @@ def parse_zumo_annotations(
     log.info(f"Parsing ZUMO annotations at {annotation_file}...")
 
     # Check annotation file path
-    annotation_file = zpy.files.verify_path(annotation_file)
+    annotation_file = zpy.files.verify_path(annotation_file, resolve=True)
     if data_dir is not None:
-        data_dir = zpy.files.verify_path(data_dir, check_dir=True)
+        data_dir = zpy.files.verify_path(data_dir, check_dir=True, resolve=True)
     else:
         # If no data_dir, assume annotation file is in the root folder.
         data_dir = annotation_file.parent
@@ -52,7 +52,9 @@ class Saver:
         # the output dir
         if output_dir is None:
             output_dir = zpy.files.default_temp_path()
-        self.output_dir = zpy.files.verify_path(output_dir, make=True, check_dir=True)
+        self.output_dir = zpy.files.verify_path(
+            output_dir, make=True, check_dir=True, resolve=True
+        )
         log.debug(f"Saver output directory at {output_dir}")
         if clean_dir:
             zpy.files.clean_dir(self.output_dir)
@@ -60,7 +62,7 @@ class Saver:
         if annotation_path is None:
             self.annotation_path = annotation_path
         else:
-            self.annotation_path = zpy.files.verify_path(annotation_path)
+            self.annotation_path = zpy.files.verify_path(annotation_path, resolve=True)
             log.debug(f"Saver annotation path at {annotation_path}")
         # Very similar keys to COCO-style
         self.metadata = {
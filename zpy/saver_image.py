@@ -233,7 +233,7 @@ class ImageSaver(zpy.saver.Saver):
         image_paths = zpy.files.sample(image_paths, sample_size=image_sample_size)
         opened_images = [zpy.image.open_image(i) for i in image_paths]
         flat_images = zpy.image.flatten_images(opened_images)
-        pixel_mean_std = zpy.image.pixel_mean_std(flat_images)
+        pixel_mean_std = zpy.image.streaming_pixel_stats(opened_images)
 
         meta_dict = {
             "number_images": len(self.images),